@@ -12,7 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from compute_wer.calculator import Calculator
 from compute_wer.utils import normalize, wer
 
 __all__ = ["Calculator", "normalize", "wer"]
+
+
+def __getattr__(name):
+    # The calculator is imported on first use, so that `compute_wer.cli` starts fast.
+    if name == "Calculator":
+        from compute_wer.calculator import Calculator
+
+        return Calculator
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,228 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import click
+
+from compute_wer.wer import DEFAULT_ENGINE, ENGINES
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# The alphabets of the synthetic scripts, the CJK and Thai ranges only contain assigned letters.
+SCRIPTS = {
+    "latin": ("abcdefghijklmnopqrstuvwxyz", 2, 8),
+    "cjk": ("".join(map(chr, range(0x4E00, 0x4FFF))), 1, 4),
+    "thai": ("".join(map(chr, range(0x0E01, 0x0E2F))), 2, 6),
+}
+STAGES = ("tokenize", "normalize", "wer", "cluster", "cli", "startup")
+# The number of the utterances scored by a process each in the startup stage.
+STARTUP_UTTS = 20
+
+
+def parse_scripts(scripts: str) -> Dict[str, float]:
+    """
+    Parse the script mix, e.g., "latin:2,cjk,thai:0.5".
+
+    Args:
+        scripts: The comma-separated scripts with the optional weights.
+    Returns:
+        The weight of each script.
+    """
+    weights = {}
+    for script in scripts.split(","):
+        name, _, weight = script.strip().partition(":")
+        if name not in SCRIPTS:
+            raise click.BadParameter(f"unknown script {name}, expected one of {', '.join(SCRIPTS)}.")
+        weights[name] = float(weight) if weight else 1.0
+    return weights
+
+
+def generate_corpus(
+    num_utts: int, length: int, scripts: Dict[str, float], error_rate: float, seed: int = 0
+) -> List[Tuple[str, str, str]]:
+    """
+    Generate a synthetic corpus.
+
+    Args:
+        num_utts: The number of utterances.
+        length: The average number of words per reference.
+        scripts: The weight of each script.
+        error_rate: The probability of a substitution, deletion or insertion per reference word.
+        seed: The random seed.
+    Returns:
+        The utterance-ids, references and hypotheses.
+    """
+    rng = random.Random(seed)
+    names, weights = list(scripts), list(scripts.values())
+
+    def word():
+        alphabet, min_len, max_len = SCRIPTS[rng.choices(names, weights)[0]]
+        return "".join(rng.choices(alphabet, k=rng.randint(min_len, max_len)))
+
+    corpus = []
+    for index in range(num_utts):
+        reference = [word() for _ in range(rng.randint(length // 2, length * 3 // 2))]
+        hypothesis = []
+        for ref_word in reference:
+            if rng.random() >= error_rate:
+                hypothesis.append(ref_word)
+                continue
+            # Substitute, delete or insert after the reference word.
+            op = rng.randrange(3)
+            if op == 0:
+                hypothesis.append(word())
+            elif op == 2:
+                hypothesis.extend([ref_word, word()])
+        corpus.append((f"utt{index:08d}", " ".join(reference), " ".join(hypothesis)))
+    return corpus
+
+
+def peak_rss(children: bool = False) -> float:
+    """Get the peak resident set size of the process (or its largest child) in MiB, or None if unavailable."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS and in KiB on Linux.
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+
+def run_stage(stage: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a stage over the synthetic corpus.
+
+    Args:
+        stage: The name of the stage.
+        config: The options of the corpus and the engine.
+    Returns:
+        The throughput and the peak memory of the stage.
+    """
+    from compute_wer.cli import cli
+    from compute_wer.utils import default_cluster, normalize, tokenize
+    from compute_wer.wer import WER
+
+    corpus = generate_corpus(config["utts"], config["length"], config["scripts"], config["error_rate"], config["seed"])
+    if stage == "startup":
+        corpus = corpus[:STARTUP_UTTS]
+    pairs = [(normalize(ref), normalize(hyp)) for _, ref, hyp in corpus]
+    num_tokens = sum(len(ref) + len(hyp) for ref, hyp in pairs)
+    engine = config["engine"]
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if stage == "cli":
+            ref_path, hyp_path = os.path.join(tmpdir, "ref.txt"), os.path.join(tmpdir, "hyp.txt")
+            with open(ref_path, "w", encoding="utf-8") as fref, open(hyp_path, "w", encoding="utf-8") as fhyp:
+                for utt, ref, hyp in corpus:
+                    fref.write(f"{utt} {ref}\n")
+                    fhyp.write(f"{utt} {hyp}\n")
+            args = ["score", ref_path, hyp_path, os.path.join(tmpdir, "wer.txt"), "--engine", engine]
+
+        start = time.perf_counter()
+        for _ in range(config["repeat"]):
+            if stage == "tokenize":
+                for _, ref, hyp in corpus:
+                    tokenize(ref)
+                    tokenize(hyp)
+            elif stage == "normalize":
+                for _, ref, hyp in corpus:
+                    normalize(ref)
+                    normalize(hyp)
+            elif stage == "wer":
+                for ref, hyp in pairs:
+                    WER(ref, hyp, engine)
+            elif stage == "cluster":
+                for ref, hyp in pairs:
+                    for token in ref + hyp:
+                        default_cluster(token)
+            elif stage == "cli":
+                cli.main(args, standalone_mode=False)
+            elif stage == "startup":
+                # A process per utterance, like the shell pipelines scoring single strings.
+                for _, ref, hyp in corpus:
+                    command = [sys.executable, "-m", "compute_wer.cli", "--engine", engine, "--", ref, hyp]
+                    subprocess.run(command, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        seconds = (time.perf_counter() - start) / config["repeat"]
+
+    return {
+        "seconds": round(seconds, 6),
+        "utts_per_sec": round(len(corpus) / seconds, 2),
+        "tokens_per_sec": round(num_tokens / seconds, 2),
+        "peak_rss_mb": peak_rss(children=stage == "startup"),
+    }
+
+
+@click.command(help="Benchmark the tokenizer, the aligner and the end-to-end CLI on synthetic corpora.")
+@click.option("--utts", "-n", type=int, default=10000, help="Number of utterances.")
+@click.option("--length", "-l", type=int, default=20, help="Average number of words per reference.")
+@click.option(
+    "--scripts", default="latin,cjk,thai", help="Script mix with optional weights, e.g., `latin:2,cjk,thai:0.5`."
+)
+@click.option("--error-rate", type=float, default=0.1, help="Probability of an error per reference word.")
+@click.option("--seed", type=int, default=0, help="Random seed of the corpus.")
+@click.option("--repeat", "-r", type=int, default=1, help="Number of runs per stage, the mean time is reported.")
+@click.option(
+    "--stage",
+    "stages",
+    multiple=True,
+    type=click.Choice(STAGES),
+    help="Stage to benchmark, can be given multiple times (default: all stages).",
+)
+@click.option("--engine", "-e", type=click.Choice(list(ENGINES)), default=DEFAULT_ENGINE, help="Alignment engine.")
+@click.option("--output-file", "-o", type=click.Path(dir_okay=False), help="Path to the JSON output (default: stdout).")
+def main(utts, length, scripts, error_rate, seed, repeat, stages, engine, output_file):
+    config = {
+        "utts": utts,
+        "length": length,
+        "scripts": parse_scripts(scripts),
+        "error_rate": error_rate,
+        "seed": seed,
+        "repeat": repeat,
+        "engine": engine,
+    }
+    results = {}
+    # Every stage runs in a fresh process, so that the peak RSS is not shared with the other stages.
+    context = multiprocessing.get_context("spawn")
+    for stage in stages or STAGES:
+        with ProcessPoolExecutor(1, mp_context=context) as executor:
+            results[stage] = executor.submit(run_stage, stage, config).result()
+        click.echo(f"{stage}: {results[stage]['utts_per_sec']} utts/s", err=True)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": config,
+        "stages": results,
+    }
+    output = json.dumps(report, indent=2)
+    if output_file is None:
+        click.echo(output)
+    else:
+        with open(output_file, "w", encoding="utf-8") as fout:
+            fout.write(output + "\n")
+
+
+if __name__ == "__main__":
+    main()
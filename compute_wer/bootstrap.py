@@ -0,0 +1,132 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import Dict, Optional, Sequence
+
+import numpy as np
+
+# The maximum number of elements drawn per chunk of resamples, bounds the memory to ~100 MB.
+CHUNK_ELEMENTS = 1 << 23
+
+
+def resample_sums(columns: np.ndarray, num_samples: int, seed: Optional[int] = None) -> np.ndarray:
+    """
+    Resample the utterances with replacement and sum the columns of each resample.
+
+    The utterances with the same values are grouped first, and a resample is drawn as the multinomial
+    counts of the groups, which has the same distribution as drawing the utterance indices and is much
+    cheaper when there are few distinct values (e.g., the error and length counts). Otherwise the
+    indices are drawn and gathered in chunks of resamples.
+
+    Args:
+        columns: The values of the utterances, of shape (num_utterances, num_columns).
+        num_samples: The number of resamples.
+        seed: The random seed.
+    Returns:
+        The sums of the columns of each resample, of shape (num_samples, num_columns).
+    """
+    rng = np.random.default_rng(seed)
+    num_utts = len(columns)
+    groups, counts = np.unique(columns, axis=0, return_counts=True)
+    groups = groups.astype(np.float64)
+    sums = np.empty((num_samples, columns.shape[1]))
+    # Drawing a multinomial count costs about ten times as much as drawing and gathering an index.
+    grouped = len(groups) * 10 < num_utts
+    size = len(groups) if grouped else num_utts
+    chunk = max(1, CHUNK_ELEMENTS // size)
+    for start in range(0, num_samples, chunk):
+        stop = min(start + chunk, num_samples)
+        if grouped:
+            weights = rng.multinomial(num_utts, counts / num_utts, size=stop - start)
+            sums[start:stop] = weights @ groups
+        else:
+            indices = rng.integers(0, num_utts, size=(stop - start, num_utts), dtype=np.int64)
+            for column in range(columns.shape[1]):
+                sums[start:stop, column] = columns[:, column][indices].sum(axis=1)
+    return sums
+
+
+def bootstrap_wer(
+    errors: Sequence[int],
+    lengths: Sequence[int],
+    num_samples: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Calculate the bootstrap confidence interval of the WER.
+
+    Args:
+        errors: The number of errors of each utterance.
+        lengths: The number of reference tokens of each utterance.
+        num_samples: The number of resamples.
+        confidence: The confidence level of the interval.
+        seed: The random seed.
+    Returns:
+        The WER, the lower and upper bounds of the interval and the standard error.
+    """
+    columns = np.stack([np.asarray(errors, dtype=np.int64), np.asarray(lengths, dtype=np.int64)], axis=1)
+    if len(columns) == 0:
+        return {"wer": 0.0, "low": 0.0, "high": 0.0, "std": 0.0}
+    sums = resample_sums(columns, num_samples, seed)
+    wers = np.divide(sums[:, 0], sums[:, 1], out=np.zeros(num_samples), where=sums[:, 1] > 0)
+    total = columns.sum(axis=0)
+    low, high = np.quantile(wers, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return {
+        "wer": float(total[0] / total[1]) if total[1] > 0 else 0.0,
+        "low": float(low),
+        "high": float(high),
+        "std": float(wers.std(ddof=1)) if num_samples > 1 else 0.0,
+    }
+
+
+def paired_bootstrap(
+    errors: Sequence[int],
+    other_errors: Sequence[int],
+    lengths: Sequence[int],
+    num_samples: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict[str, float]:
+    """
+    Test the WER difference of two systems on the same utterances with the paired bootstrap.
+
+    Args:
+        errors: The number of errors of each utterance of the first system.
+        other_errors: The number of errors of each utterance of the second system.
+        lengths: The number of reference tokens of each utterance.
+        num_samples: The number of resamples.
+        confidence: The confidence level of the interval.
+        seed: The random seed.
+    Returns:
+        The WER difference (second - first), the lower and upper bounds of its interval and the two-sided p-value.
+    """
+    if not len(errors) == len(other_errors) == len(lengths):
+        raise ValueError("The paired bootstrap requires the same utterances of the two systems.")
+    diffs = np.asarray(other_errors, dtype=np.int64) - np.asarray(errors, dtype=np.int64)
+    columns = np.stack([diffs, np.asarray(lengths, dtype=np.int64)], axis=1)
+    if len(columns) == 0:
+        return {"delta": 0.0, "low": 0.0, "high": 0.0, "p_value": 1.0}
+    # The WER difference of a resample only depends on the error differences and the lengths.
+    sums = resample_sums(columns, num_samples, seed)
+    deltas = np.divide(sums[:, 0], sums[:, 1], out=np.zeros(num_samples), where=sums[:, 1] > 0)
+    total = columns.sum(axis=0)
+    low, high = np.quantile(deltas, [(1 - confidence) / 2, (1 + confidence) / 2])
+    p_value = 2 * min(np.mean(deltas <= 0), np.mean(deltas >= 0))
+    return {
+        "delta": float(total[0] / total[1]) if total[1] > 0 else 0.0,
+        "low": float(low),
+        "high": float(high),
+        "p_value": float(min(p_value, 1.0)),
+    }
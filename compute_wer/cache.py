@@ -0,0 +1,132 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+
+
+class ResultCache:
+    """
+    The on-disk cache of the alignments, keyed by the normalized reference, hypothesis and options.
+
+    The edit operations are stored rather than the counts, the utterance and token counts
+    (and the alignment itself) are cheaply rebuilt from them. The least recently used
+    entries are evicted when the cache holds more than `max_entries` entries.
+    """
+
+    def __init__(self, cache_dir: str, max_entries: int = 1000000, flush_every: int = 10000):
+        """
+        Open or create the cache.
+
+        Args:
+            cache_dir: The directory of the cache.
+            max_entries: The maximum number of entries kept after flushing.
+            flush_every: The number of pending writes triggering a flush.
+        """
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "results.sqlite"))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS results (key BLOB PRIMARY KEY, ops TEXT, used REAL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self.pending = {}
+        self.touched = set()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(reference: List[str], hypothesis: List[str], options: Dict[str, Any]) -> bytes:
+        """
+        Get the key of an utterance.
+
+        Args:
+            reference: The normalized reference tokens.
+            hypothesis: The normalized hypothesis tokens.
+            options: The normalization options.
+        Returns:
+            The key of the utterance.
+        """
+        # The tokens never contain whitespace, so the separators are unambiguous.
+        text = "\n".join((json.dumps(options, sort_keys=True), " ".join(reference), " ".join(hypothesis)))
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def get(self, key: bytes) -> Optional[str]:
+        """
+        Get the edit operations of an utterance.
+
+        Args:
+            key: The key of the utterance.
+        Returns:
+            The edit operations, or None if the utterance is not cached.
+        """
+        ops = self.pending.get(key)
+        if ops is None:
+            row = self.conn.execute("SELECT ops FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            ops = row[0]
+            self.touched.add(key)
+            self.maybe_flush()
+        self.hits += 1
+        return ops
+
+    def put(self, key: bytes, ops: str):
+        """
+        Put the edit operations of an utterance.
+
+        Args:
+            key: The key of the utterance.
+            ops: The edit operations.
+        """
+        self.pending[key] = ops
+        self.maybe_flush()
+
+    def maybe_flush(self):
+        if len(self.pending) + len(self.touched) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Write the pending entries and access times, then evict the least recently used entries."""
+        now = time.time()
+        with self.conn:
+            self.conn.executemany("UPDATE results SET used = ? WHERE key = ?", ((now, key) for key in self.touched))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?)",
+                ((key, ops, now) for key, ops in self.pending.items()),
+            )
+            excess = self.conn.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY used LIMIT ?)", (excess,)
+                )
+        self.pending.clear()
+        self.touched.clear()
+
+    def close(self):
+        """Flush and close the cache."""
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "ResultCache":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
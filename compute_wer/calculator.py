@@ -12,13 +12,188 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from __future__ import annotations
+
+import math
 import sys
-from collections import defaultdict
+import threading
+from array import array
+from collections import defaultdict, deque
+from contextlib import nullcontext
 from functools import partial
-from typing import Any, Dict, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+
+from compute_wer.utils import LRUCache, Normalizer, char_name, default_cluster, wer
+from compute_wer.wer import (
+    DEFAULT_ENGINE,
+    SER,
+    WER,
+    Alignment,
+    Engine,
+    GroupStats,
+    SlidingWindow,
+    TokenStats,
+    get_engine,
+)
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    import numpy as np
+
+    from compute_wer.cache import ResultCache
+    from compute_wer.rules import RewriteRules
+
+
+def _score(wer: Callable, pairs: List[Tuple[str, str]], align: bool) -> List[tuple]:
+    """
+    Score a shard of utterance pairs in a worker process.
+
+    Args:
+        wer: The WER function with the normalization options bound.
+        pairs: The list of (reference, hypothesis) pairs.
+        align: Whether to return the alignment of the reference and hypothesis.
+    Returns:
+        The list of (counts, token counts, alignment) for each pair, the counts are None if filtered by max_wer.
+    """
+    results = []
+    for reference, hypothesis in pairs:
+        _wer = wer(reference, hypothesis)
+        if _wer.filtered:
+            results.append((None, {}, None))
+            continue
+        tokens = {token: _wer.tokens[token].counts for token in _wer.tokens}
+        results.append((_wer.counts, tokens, _wer.alignment if align else None))
+    return results
+
+
+def _worker_stats(wer: Callable) -> Tuple[Dict[int, int], Dict[str, Any]]:
+    """
+    Get and reset the statistics collected by a worker besides the results.
+
+    The rules and the engine of a worker are kept across its tasks (see `shared_instance`), so their statistics
+    are reset for each task.
+
+    Args:
+        wer: The WER function with the normalizer and the engine bound.
+    Returns:
+        The number of hits of each rewrite rule, and the counters of the engine.
+    """
+    rules = wer.keywords["normalizer"].rules
+    return rules.pop_hits() if rules is not None else {}, wer.keywords["engine"].pop_stats()
+
+
+def _score_chunk(
+    wer: Callable, pairs: List[Tuple[str, str]], align: bool
+) -> Tuple[List[tuple], Tuple[Dict[int, int], Dict[str, Any]]]:
+    """
+    Score a chunk of utterance pairs in a worker process, with the statistics of the rules and the engine.
+
+    Args:
+        wer: The WER function with the normalization options bound.
+        pairs: The list of (reference, hypothesis) pairs.
+        align: Whether to return the alignment of the reference and hypothesis.
+    Returns:
+        The results of `_score`, and the statistics of the worker (see `_worker_stats`).
+    """
+    results = _score(wer, pairs, align)
+    return results, _worker_stats(wer)
+
+
+def _score_shared(
+    wer: Callable,
+    name: str,
+    shape: Tuple[int, int],
+    chunks: List[Tuple[int, List[Tuple[str, str]]]],
+    align: bool,
+    max_wer: float,
+) -> Tuple[TokenStats, Tuple[Dict[int, int], Dict[str, Any]], Optional[List[tuple]]]:
+    """
+    Score the chunks of utterance pairs of a worker process, writing the counts into the shared array.
+
+    Args:
+        wer: The WER function with the normalization options bound.
+        name: The name of the shared memory block of the counts.
+        shape: The shape of the counts, (number of utterances, SHARED_COLUMNS).
+        chunks: The (position of the first pair in the batch, pairs) of each chunk.
+        align: Whether to return the alignments.
+        max_wer: The maximum WER of the utterances counted in the token statistics.
+    Returns:
+        The token statistics of all the chunks, the statistics of the worker (see `_worker_stats`), and the
+        (edit operations, reference tokens, hypothesis tokens) of each pair of each chunk if `align`, the tokens
+        joined by newlines.
+    """
+    from multiprocessing import shared_memory
+
+    import numpy as np
+
+    shm = shared_memory.SharedMemory(name=name)
+    counts = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+    tokens = TokenStats()
+    alignments = [] if align else None
+    try:
+        for start, pairs in chunks:
+            if align:
+                alignments.append([])
+            for position, (reference, hypothesis) in enumerate(pairs, start):
+                _wer = wer(reference, hypothesis)
+                if _wer.filtered:
+                    counts[position, 4] = 1
+                    if align:
+                        alignments[-1].append(None)
+                    continue
+                counts[position, :4] = _wer.counts
+                if _wer.wer < max_wer:
+                    for token, token_wer in _wer.tokens.items():
+                        tokens.add(token, token_wer.counts)
+                if align:
+                    alignment = _wer.alignment
+                    alignments[-1].append((alignment.ops, "\n".join(alignment.ref), "\n".join(alignment.hyp)))
+    finally:
+        # The view must be released before the shared memory is closed.
+        del counts
+        shm.close()
+    return tokens, _worker_stats(wer), alignments
+
+
+def _from_result(counts: Tuple[int, int, int, int], tokens: Dict[str, tuple], alignment: Optional[Alignment]) -> WER:
+    """
+    Rebuild a WER from the result returned by a worker.
 
-from compute_wer.utils import default_cluster, wer
-from compute_wer.wer import SER, WER
+    Args:
+        counts: The counts of the utterance.
+        tokens: The counts of each token.
+        alignment: The alignment of the reference and hypothesis, or None.
+    Returns:
+        The WER result.
+    """
+    if counts is None:
+        return WER.from_filtered()
+    _wer = WER.from_counts(*counts)
+    _wer.tokens = defaultdict(WER)
+    for token, token_counts in tokens.items():
+        _wer.tokens[token] = WER.from_counts(*token_counts)
+    _wer.alignment = alignment
+    return _wer
+
+
+STATE_VERSION = 1
+# The columns of the shared counts of each utterance: equal, replace, delete, insert and filtered.
+SHARED_COLUMNS = 5
+NORMALIZATION_OPTIONS = ("to_char", "case_sensitive", "remove_tag", "ignore_words", "ignore_punctuation")
 
 
 class Calculator:
@@ -30,6 +205,16 @@ class Calculator:
         ignore_words: set = set(),
         ignore_punctuation: bool = False,
         max_wer: float = sys.maxsize,
+        engine: Union[str, Engine] = DEFAULT_ENGINE,
+        cluster: bool = True,
+        cluster_fn: Callable[[str], str] = default_cluster,
+        cache_size: Optional[int] = 65536,
+        result_cache: Optional[ResultCache] = None,
+        profile: bool = False,
+        window_size: int = 1000,
+        confusion: bool = False,
+        rules: Optional[RewriteRules] = None,
+        bootstrap: bool = False,
     ):
         """
         Calculate the WER and align the reference and hypothesis.
@@ -42,41 +227,630 @@ class Calculator:
             remove_tag: Whether to remove the tags.
             ignore_punctuation: Whether to ignore punctuation (except single quotes).
             ignore_words: The words to ignore.
+            max_wer: The maximum WER of the utterances counted in the statistics.
+            engine: The name of the alignment engine, or the engine (e.g., with its own options), sent to the
+                worker processes with the normalizer.
+            cluster: Whether to collect the token and cluster statistics.
+            cluster_fn: The function to get the cluster of a token.
+            cache_size: The maximum number of entries of each cache (None for unbounded).
+            result_cache: The on-disk cache of the alignments, shared across runs, only with an exact engine.
+            profile: Whether to collect the wall time of each stage and the largest utterances in `profiler`.
+            window_size: The number of the last utterances in the sliding window of `snapshot`.
+            confusion: Whether to collect the substitution, deletion and insertion pairs in `confusion`.
+            rules: The rewrite rules applied to the texts before tokenization, see `RewriteRules`.
+            bootstrap: Whether to record the errors and length of each counted utterance for `bootstrap` and
+                `paired_bootstrap`, the memory and the state grow with the number of utterances.
         """
-        self.wer = partial(
-            wer,
-            to_char=to_char,
-            case_sensitive=case_sensitive,
-            remove_tag=remove_tag,
-            ignore_words=ignore_words,
-            ignore_punctuation=ignore_punctuation,
+        self.engine = get_engine(engine)
+        if result_cache is not None and not self.engine.exact:
+            # The cached alignments are keyed by the texts and the normalization only, not by the engine.
+            raise ValueError(f"The result cache requires an exact engine, not {self.engine.name}")
+        self.profiler = None
+        if profile:
+            from compute_wer.profiler import Profiler
+
+            self.profiler = Profiler()
+        self.normalizer = Normalizer(
+            to_char, case_sensitive, remove_tag, ignore_words, ignore_punctuation, cache_size=cache_size, rules=rules
         )
+        self.caches = {"token": self.normalizer.cache}
+        if cluster_fn is default_cluster:
+            self.caches["char_name"] = LRUCache(char_name, cache_size)
+            cluster_fn = partial(default_cluster, get_name=self.caches["char_name"])
+        if profile:
+            cluster_fn = self.profiler.wrap("cluster", cluster_fn)
+        self.caches["cluster"] = LRUCache(cluster_fn, cache_size)
+        self.options = {
+            "to_char": to_char,
+            "case_sensitive": case_sensitive,
+            "remove_tag": remove_tag,
+            "ignore_words": sorted(ignore_words),
+            "ignore_punctuation": ignore_punctuation,
+            "max_wer": max_wer,
+            "engine": self.engine.name,
+            "cluster": cluster,
+            "confusion": confusion,
+            "bootstrap": bootstrap,
+        }
+        self.wer = partial(wer, engine=self.engine, tokens=cluster, max_wer=max_wer, normalizer=self.normalizer)
+        self.normalize = self.normalizer
+        self.normalize_ids = self.normalizer.ids
+        if profile:
+            self.normalize = self.profiler.wrap("normalize", self.normalize)
+            self.normalize_ids = self.profiler.wrap("normalize", self.normalize_ids)
+        self.result_cache = result_cache
         self.clusters = defaultdict(set)
-        self.tokens = defaultdict(WER)
+        self.tokens = TokenStats()
+        self.confusion = None
+        if confusion:
+            from compute_wer.confusion import ConfusionIndex
+
+            self.confusion = ConfusionIndex()
+        self.groups = GroupStats()
+        self.total = WER()
         self.max_wer = max_wer
         self.ser = SER()
+        # The errors and lengths of the counted utterances in the scoring order, for the bootstrap.
+        self.utt_errors = array("q") if bootstrap else None
+        self.utt_lengths = array("q") if bootstrap else None
+        self.window = SlidingWindow(window_size)
+        # Guards the statistics read by `snapshot`, which may be polled from another thread.
+        self.lock = threading.Lock()
 
-    def calculate(self, reference: str, hypothesis: str) -> Dict[str, Any]:
+    def stage(self, name: str):
+        """
+        Time a block as a stage of the profile, or do nothing if profiling is disabled.
+
+        Args:
+            name: The name of the stage.
+        """
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
+    def calculate(self, reference: str, hypothesis: str, groups: Optional[Iterable[str]] = None) -> Dict[str, Any]:
         """
         Calculate the WER for the reference and hypothesis.
 
         Args:
             reference: The reference text.
             hypothesis: The hypothesis text.
+            groups: The groups of the utterance (e.g., its speaker and domain), accumulated in `groups`.
+        Returns:
+            result: The WER result.
+        """
+        ids = self.normalize_ids(reference), self.normalize_ids(hypothesis)
+        decode = self.normalizer.decode
+        return self.calculate_normalized(decode(ids[0]), decode(ids[1]), ids, groups)
+
+    def calculate_normalized(
+        self,
+        reference: List[str],
+        hypothesis: List[str],
+        ids: Optional[Tuple[array, array]] = None,
+        groups: Optional[Iterable[str]] = None,
+    ) -> WER:
+        """
+        Calculate the WER for the normalized reference and hypothesis, e.g., shared by several systems.
+
+        Args:
+            reference: The normalized reference tokens.
+            hypothesis: The normalized hypothesis tokens.
+            ids: The token ids of the reference and hypothesis interned by `normalizer`, aligned instead of the tokens.
+            groups: The groups of the utterance, accumulated in `groups`.
         Returns:
             result: The WER result.
         """
-        _wer = self.wer(reference, hypothesis)
-        if _wer.wer < self.max_wer:
-            for token in _wer.tokens:
-                self.clusters[default_cluster(token)].add(token)
-                self.tokens[token].update(_wer.tokens[token])
-            if _wer.wer == 0:
-                self.ser.cor += 1
-            else:
-                self.ser.err += 1
+        _wer = self.lookup(reference, hypothesis) if self.result_cache is not None else None
+        if _wer is None:
+            with self.stage("align"):
+                options = (self.engine, self.options["cluster"], self.max_wer)
+                _wer = WER(reference, hypothesis, *options, ids)
+            if self.result_cache is not None and not _wer.filtered:
+                self.store(_wer)
+        self.update(_wer, groups)
         return _wer
 
+    def lookup(self, reference: List[str], hypothesis: List[str]) -> Optional[WER]:
+        """
+        Look up the WER of the normalized reference and hypothesis in the result cache.
+
+        Args:
+            reference: The normalized reference tokens.
+            hypothesis: The normalized hypothesis tokens.
+        Returns:
+            The WER result, or None if it is not cached.
+        """
+        options = {key: self.options[key] for key in NORMALIZATION_OPTIONS}
+        with self.stage("cache"):
+            ops = self.result_cache.get(self.result_cache.key(reference, hypothesis, options))
+        if ops is None:
+            return None
+        return WER.from_alignment(Alignment(reference, hypothesis, ops), self.options["cluster"])
+
+    def store(self, _wer: WER):
+        """
+        Store the alignment of a WER result in the result cache.
+
+        Args:
+            _wer: The WER result.
+        """
+        options = {key: self.options[key] for key in NORMALIZATION_OPTIONS}
+        key = self.result_cache.key(_wer.alignment.ref, _wer.alignment.hyp, options)
+        with self.stage("cache"):
+            self.result_cache.put(key, _wer.alignment.ops)
+
+    def calculate_batch(
+        self,
+        pairs: List[Tuple[str, str]],
+        jobs: int = 1,
+        chunksize: Optional[int] = None,
+        align: bool = True,
+        groups: Optional[List[Iterable[str]]] = None,
+    ) -> List[WER]:
+        """
+        Calculate the WERs for a batch of references and hypotheses, optionally in parallel.
+
+        Args:
+            pairs: The list of (reference, hypothesis) pairs.
+            jobs: The number of worker processes.
+            chunksize: The number of pairs scored per task (default: spread evenly over the workers).
+            align: Whether to keep the alignment of the reference and hypothesis.
+            groups: The groups of each pair, accumulated in `groups`.
+        Returns:
+            The list of WER results, in the same order as the pairs. With several jobs, the token counts of each
+            utterance are only accumulated in `tokens` (see `calculate_shared`).
+        """
+        if groups is None:
+            groups = [()] * len(pairs)
+        if jobs <= 1:
+            return [
+                self.calculate(reference, hypothesis, names) for (reference, hypothesis), names in zip(pairs, groups)
+            ]
+        if self.result_cache is None and self.confusion is None:
+            return self.calculate_shared(pairs, jobs, chunksize, align, groups)
+
+        wers = [None] * len(pairs)
+        todo = range(len(pairs))
+        if self.result_cache is not None:
+            todo = []
+            for index, (reference, hypothesis) in enumerate(pairs):
+                wers[index] = self.lookup(self.normalize(reference), self.normalize(hypothesis))
+                if wers[index] is None:
+                    todo.append(index)
+        # The result cache and the confusion index are built from the alignments.
+        align = align or self.result_cache is not None or self.confusion is not None
+        with self.stage("align"):
+            scored = list(self.score_parallel([pairs[index] for index in todo], jobs, chunksize, align))
+        for index, _wer in zip(todo, scored):
+            if self.result_cache is not None and not _wer.filtered:
+                self.store(_wer)
+            wers[index] = _wer
+        for _wer, names in zip(wers, groups):
+            self.update(_wer, names)
+        return wers
+
+    def calculate_shared(
+        self,
+        pairs: List[Tuple[str, str]],
+        jobs: int,
+        chunksize: Optional[int] = None,
+        align: bool = True,
+        groups: Optional[List[Iterable[str]]] = None,
+    ) -> List[WER]:
+        """
+        Calculate the WERs for a batch in worker processes, aggregating the results through shared memory.
+
+        The workers write the counts of each utterance into a shared array indexed by the position of the
+        utterance. Each worker scores a single task of interleaved chunks (the chunks k, k + jobs, ...) and
+        accumulates the token statistics of all its chunks into one local table, so no WER object is pickled
+        and the tables are merged once per worker. The alignments are only sent back as the edit operations and
+        the joined tokens. The statistics are then updated from the array at once.
+
+        Args:
+            pairs: The list of (reference, hypothesis) pairs.
+            jobs: The number of worker processes.
+            chunksize: The number of consecutive pairs of each interleaved chunk (default: spread evenly over the
+                workers).
+            align: Whether to keep the alignment of the reference and hypothesis.
+            groups: The groups of each pair, accumulated in `groups`.
+        Returns:
+            The list of WER results without the token counts, in the same order as the pairs.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import shared_memory
+
+        import numpy as np
+
+        if chunksize is None:
+            chunksize = min(max(1, math.ceil(len(pairs) / (jobs * 4))), 1000)
+        chunks = [(start, pairs[start : start + chunksize]) for start in range(0, len(pairs), chunksize)]
+        shape = (len(pairs), SHARED_COLUMNS)
+        tokens = TokenStats()
+        alignments = [None] * len(pairs)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(pairs) * SHARED_COLUMNS * 8))
+        shared = None
+        try:
+            shared = np.ndarray(shape, dtype=np.int64, buffer=shm.buf)
+            shared[:] = 0
+            task = partial(_score_shared, self.wer, shm.name, shape, align=align, max_wer=self.max_wer)
+            tasks = [chunks[k::jobs] for k in range(min(jobs, len(chunks)))]
+            with self.stage("align"), ProcessPoolExecutor(jobs) as executor:
+                for worker_chunks, (worker_tokens, stats, worker_alignments) in zip(tasks, executor.map(task, tasks)):
+                    tokens.merge(worker_tokens)
+                    self.merge_worker_stats(stats)
+                    if align:
+                        for (start, chunk), chunk_alignments in zip(worker_chunks, worker_alignments):
+                            alignments[start : start + len(chunk)] = chunk_alignments
+            counts = shared.copy()
+        finally:
+            # The view must be released before the shared memory is closed.
+            shared = None
+            shm.close()
+            shm.unlink()
+        self.update_counts(counts, tokens, groups)
+
+        wers = []
+        for position, row in enumerate(counts.tolist()):
+            if row[4]:
+                wers.append(WER.from_filtered())
+                continue
+            _wer = WER.from_counts(*row[:4])
+            _wer.tokens = defaultdict(WER)
+            if align:
+                ops, reference, hypothesis = alignments[position]
+                _wer.alignment = Alignment(
+                    reference.split("\n") if reference else [], hypothesis.split("\n") if hypothesis else [], ops
+                )
+            wers.append(_wer)
+        return wers
+
+    def update_counts(self, counts: np.ndarray, tokens: TokenStats, groups: Optional[List[Iterable[str]]] = None):
+        """
+        Accumulate the counts of a batch of utterances at once, same as `update` for each utterance.
+
+        Args:
+            counts: The (equal, replace, delete, insert, filtered) counts of each utterance, of shape (n, 5).
+            tokens: The token statistics of the counted utterances.
+            groups: The groups of each utterance.
+        """
+        import numpy as np
+
+        lengths = counts[:, :3].sum(axis=1)
+        errors = counts[:, 1:4].sum(axis=1)
+        wers = np.divide(errors, lengths, out=np.zeros(len(counts)), where=lengths > 0)
+        wers[counts[:, 4] == 1] = math.inf
+        counted = np.flatnonzero(wers < self.max_wer)
+        if self.profiler is not None:
+            for length, delete, insert in zip(lengths.tolist(), counts[:, 2].tolist(), counts[:, 3].tolist()):
+                self.profiler.utterance(length, length - delete + insert)
+        with self.stage("update"), self.lock:
+            self.total.update(WER.from_counts(*counts[counted, :4].sum(axis=0).tolist()))
+            for row in counts[counted[-self.window.size :], :4].tolist():
+                self.window.add(tuple(row))
+            if self.utt_errors is not None:
+                self.utt_errors.extend(errors[counted].tolist())
+                self.utt_lengths.extend(lengths[counted].tolist())
+            self.tokens.merge(tokens)
+            for token in tokens:
+                self.clusters[self.caches["cluster"](token)].add(token)
+            correct = int((wers[counted] == 0).sum())
+            self.ser.cor += correct
+            self.ser.err += len(counted) - correct
+            if groups is not None:
+                for position in counted.tolist():
+                    if groups[position]:
+                        self.groups.add(groups[position], tuple(counts[position, :4].tolist()), wers[position] == 0)
+
+    def score_parallel(
+        self, pairs: List[Tuple[str, str]], jobs: int, chunksize: Optional[int] = None, align: bool = True
+    ) -> Iterator[WER]:
+        """
+        Score the references and hypotheses in worker processes, without updating the statistics.
+
+        Args:
+            pairs: The list of (reference, hypothesis) pairs.
+            jobs: The number of worker processes.
+            chunksize: The number of pairs scored per task (default: spread evenly over the workers).
+            align: Whether to keep the alignment of the reference and hypothesis.
+        Returns:
+            The iterator of WER results, in the same order as the pairs.
+        """
+        if chunksize is None:
+            chunksize = min(max(1, math.ceil(len(pairs) / (jobs * 4))), 1000)
+        chunks = [pairs[i : i + chunksize] for i in range(0, len(pairs), chunksize)]
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(jobs) as executor:
+            for results, stats in executor.map(partial(_score_chunk, self.wer, align=align), chunks):
+                self.merge_worker_stats(stats)
+                for result in results:
+                    yield _from_result(*result)
+
+    def merge_worker_stats(self, stats: Tuple[Dict[int, int], Dict[str, Any]]):
+        """
+        Add the statistics of the rewrite rules and the engine collected by a worker.
+
+        Args:
+            stats: The number of hits of each rule by index, and the counters of the engine, see `_worker_stats`.
+        """
+        hits, engine_stats = stats
+        if self.normalizer.rules is not None:
+            self.normalizer.rules.merge_hits(hits)
+        self.engine.merge_stats(engine_stats)
+
+    def update(self, _wer: WER, groups: Optional[Iterable[str]] = None):
+        """
+        Accumulate a WER result into the token, cluster, group and sentence statistics.
+
+        Args:
+            _wer: The WER result.
+            groups: The groups of the utterance.
+        """
+        if self.profiler is not None:
+            self.profiler.utterance(_wer.all, _wer.all - _wer.delete + _wer.insert)
+        with self.stage("update"), self.lock:
+            if _wer.wer < self.max_wer:
+                self.total.update(_wer)
+                self.window.add(_wer.counts)
+                if self.utt_errors is not None:
+                    self.utt_errors.append(_wer.replace + _wer.delete + _wer.insert)
+                    self.utt_lengths.append(_wer.all)
+                for token in _wer.tokens:
+                    self.clusters[self.caches["cluster"](token)].add(token)
+                    self.tokens.add(token, _wer.tokens[token].counts)
+                if self.confusion is not None and _wer.alignment is not None:
+                    self.confusion.add(_wer.alignment)
+                if groups:
+                    self.groups.add(groups, _wer.counts, _wer.wer == 0)
+                if _wer.wer == 0:
+                    self.ser.cor += 1
+                else:
+                    self.ser.err += 1
+
+    def consume(
+        self, items: Iterable[Tuple[str, str, str]], executor: Optional[Executor] = None, max_pending: int = 64
+    ) -> Iterator[Tuple[str, WER]]:
+        """
+        Score the (utt, reference, hypothesis) items as they arrive, e.g., from a live service.
+
+        With a process executor, each worker builds the normalization pipeline of the Calculator once and keeps
+        its caches across the utterances (see `shared_instance`), and the hits of the rewrite rules and the counters
+        of the engine are sent back with the results.
+
+        Args:
+            items: The iterable of (utt, reference, hypothesis).
+            executor: The executor aligning the utterances (default: align in the calling thread).
+            max_pending: The maximum number of the utterances submitted to the executor and not yet collected.
+        Returns:
+            The iterator of (utt, WER), in the arrival order.
+        """
+        if executor is None:
+            for utt, reference, hypothesis in items:
+                yield utt, self.calculate(reference, hypothesis)
+            return
+        pending = deque()
+        for utt, reference, hypothesis in items:
+            pending.append((utt, executor.submit(_score_chunk, self.wer, [(reference, hypothesis)], True)))
+            while len(pending) >= max_pending or (pending and pending[0][1].done()):
+                utt, future = pending.popleft()
+                yield self.collect(utt, future.result())
+        while pending:
+            utt, future = pending.popleft()
+            yield self.collect(utt, future.result())
+
+    async def aconsume(
+        self,
+        items: AsyncIterable[Tuple[str, str, str]],
+        executor: Optional[Executor] = None,
+        max_pending: int = 64,
+    ) -> AsyncIterator[Tuple[str, WER]]:
+        """
+        Score the (utt, reference, hypothesis) items of an async iterable as they arrive, without blocking the loop.
+
+        Args:
+            items: The async iterable of (utt, reference, hypothesis).
+            executor: The executor aligning the utterances (default: the default executor of the loop).
+            max_pending: The maximum number of the utterances submitted to the executor and not yet collected.
+        Returns:
+            The async iterator of (utt, WER), in the arrival order.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        pending = deque()
+        async for utt, reference, hypothesis in items:
+            future = loop.run_in_executor(executor, _score_chunk, self.wer, [(reference, hypothesis)], True)
+            pending.append((utt, future))
+            while len(pending) >= max_pending or (pending and pending[0][1].done()):
+                utt, future = pending.popleft()
+                yield self.collect(utt, await future)
+        while pending:
+            utt, future = pending.popleft()
+            yield self.collect(utt, await future)
+
+    def collect(self, utt: str, results: Tuple[List[tuple], tuple]) -> Tuple[str, WER]:
+        """
+        Accumulate the result of an utterance scored by a worker.
+
+        Args:
+            utt: The utterance-id.
+            results: The results and the statistics returned by the worker, see `_score_chunk`.
+        Returns:
+            The utterance-id and the WER result.
+        """
+        results, stats = results
+        self.merge_worker_stats(stats)
+        _wer = _from_result(*results[0])
+        self.update(_wer)
+        return utt, _wer
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a consistent copy of the cumulative and sliding-window statistics, safe to poll from another thread.
+
+        Returns:
+            The cumulative WER and SER, and the WER and SER of the last `window_size` utterances.
+        """
+        with self.lock:
+            ser, window_ser = SER(), SER()
+            ser.update(self.ser)
+            window_ser.update(self.window.ser)
+            return {
+                "total": WER.from_counts(*self.total.counts),
+                "ser": ser,
+                "window": WER.from_counts(*self.window.wer.counts),
+                "window_ser": window_ser,
+            }
+
+    def cache_info(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the statistics of the raw token (see `Normalizer`), character name and cluster caches.
+
+        Returns:
+            The hits, misses, current size and maximum size of each cache.
+        """
+        return {name: cache.info() for name, cache in self.caches.items()}
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        Get the state of the statistics, which can be serialized to JSON.
+
+        Returns:
+            The options, the token, cluster, group, overall and sentence statistics, and the errors and lengths of
+            the utterances with `bootstrap`.
+        """
+        state = {
+            "version": STATE_VERSION,
+            "options": self.options,
+            "tokens": {token: self.tokens.row(token) for token in self.tokens},
+            "clusters": {name: sorted(tokens) for name, tokens in self.clusters.items()},
+            "total": self.total.counts,
+            "ser": {"cor": self.ser.cor, "err": self.ser.err, "ml": self.ser.ml, "mh": self.ser.mh},
+            "confusion": self.confusion.state_dict() if self.confusion is not None else None,
+            "groups": {name: self.groups.row(name) for name in self.groups},
+        }
+        if self.utt_errors is not None:
+            state["utterances"] = {"errors": self.utt_errors.tolist(), "lengths": self.utt_lengths.tolist()}
+        return state
+
+    def load_state_dict(self, state: Dict[str, Any]):
+        """
+        Load the statistics from a state, replacing the current statistics.
+
+        Args:
+            state: The state returned by `state_dict`.
+        """
+        if state.get("version") != STATE_VERSION:
+            raise ValueError(f"Unsupported state version: {state.get('version')}")
+        self.tokens = TokenStats()
+        for token, counts in state["tokens"].items():
+            self.tokens.add(token, counts)
+        self.clusters = defaultdict(set)
+        for name, tokens in state["clusters"].items():
+            self.clusters[name] = set(tokens)
+        self.total = WER.from_counts(*state["total"])
+        self.ser = SER()
+        for key, value in state["ser"].items():
+            setattr(self.ser, key, value)
+        if self.utt_errors is not None:
+            if "utterances" not in state:
+                raise ValueError("The state was saved without the errors and lengths of the utterances (bootstrap).")
+            self.utt_errors = array("q", state["utterances"]["errors"])
+            self.utt_lengths = array("q", state["utterances"]["lengths"])
+        if self.confusion is not None:
+            from compute_wer.confusion import ConfusionIndex
+
+            self.confusion = ConfusionIndex.from_state_dict(state["confusion"])
+        self.groups = GroupStats()
+        for name, row in state.get("groups", {}).items():
+            self.groups.add_row(name, row)
+
+    def save(self, path: str):
+        """
+        Save the state of the statistics to a JSON file, gzipped if the path ends with `.gz`.
+
+        Args:
+            path: The path to the state file.
+        """
+        import gzip
+        import json
+
+        with (gzip.open if path.endswith(".gz") else open)(path, "wt", encoding="utf-8") as fout:
+            json.dump(self.state_dict(), fout, ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def load(path: str, **kwargs) -> "Calculator":
+        """
+        Load a Calculator from a state file.
+
+        Args:
+            path: The path to the state file.
+            kwargs: The extra arguments of the Calculator (e.g., cluster_fn and cache_size).
+        Returns:
+            The Calculator with the options and the statistics of the state.
+        """
+        import gzip
+        import json
+
+        with (gzip.open if path.endswith(".gz") else open)(path, "rt", encoding="utf-8") as fin:
+            state = json.load(fin)
+        options = dict(state["options"], ignore_words=set(state["options"]["ignore_words"]))
+        # The states saved before the option always have the utterances.
+        options.setdefault("bootstrap", "utterances" in state)
+        calculator = Calculator(**options, **kwargs)
+        calculator.load_state_dict(state)
+        return calculator
+
+    def merge(self, other: "Calculator"):
+        """
+        Merge the statistics of another Calculator, e.g., scored on another shard.
+
+        Args:
+            other: The other Calculator, with the same normalization options, and both with or without `bootstrap`.
+        """
+        for key in self.options.keys() - {"engine"}:
+            if self.options[key] != other.options[key]:
+                raise ValueError(
+                    f"Cannot merge calculators with different {key}: {self.options[key]} vs {other.options[key]}"
+                )
+        self.tokens.merge(other.tokens)
+        for name, tokens in other.clusters.items():
+            self.clusters[name].update(tokens)
+        self.total.update(other.total)
+        self.ser.update(other.ser)
+        if self.utt_errors is not None:
+            self.utt_errors.extend(other.utt_errors)
+            self.utt_lengths.extend(other.utt_lengths)
+        if self.confusion is not None:
+            self.confusion.merge(other.confusion)
+        self.groups.merge(other.groups)
+
+    def confusions(
+        self,
+        k: Optional[int] = 10,
+        kind: Optional[str] = None,
+        token: Optional[str] = None,
+        cluster: Optional[str] = None,
+    ) -> List[Tuple[str, str, int]]:
+        """
+        Get the most frequent confusions from the confusion index.
+
+        Args:
+            k: The number of the confusions (None for all).
+            kind: Only get the confusions of a kind, one of `sub`, `del` and `ins` (default: all kinds).
+            token: Only get the confusions of a token, on either side.
+            cluster: Only get the confusions of the tokens of a cluster.
+        Returns:
+            The list of (reference token, hypothesis token, count), by descending count.
+        """
+        if self.confusion is None:
+            raise ValueError("The confusion index is disabled, create the Calculator with confusion=True.")
+        tokens = None
+        if token is not None:
+            tokens = [token]
+        elif cluster is not None:
+            tokens = self.clusters.get(cluster, ())
+        return self.confusion.query(k, kind, tokens)
+
     def cluster(self, tokens) -> WER:
         """
         Calculate the WER for a cluster.
@@ -86,7 +860,7 @@ class Calculator:
         Returns:
             The WER for the cluster.
         """
-        return WER.overall((self.tokens.get(token) for token in tokens))
+        return self.tokens.overall(tokens)
 
     def overall(self) -> Tuple[WER, Dict[str, WER]]:
         """
@@ -94,11 +868,52 @@ class Calculator:
 
         Returns:
             The overall WER.
-            The WER for each cluster.
+            The WER for each cluster, sorted by name so that it does not depend on the scoring order.
         """
         cluster_wers = {}
-        for name, cluster in self.clusters.items():
-            _wer = self.cluster(cluster)
+        for name in sorted(self.clusters):
+            _wer = self.cluster(self.clusters[name])
             if _wer.all > 0:
                 cluster_wers[name] = _wer
-        return WER.overall(self.tokens.values()), cluster_wers
+        return WER.from_counts(*self.total.counts), cluster_wers
+
+    def bootstrap(
+        self, num_samples: int = 1000, confidence: float = 0.95, seed: Optional[int] = None
+    ) -> Dict[str, float]:
+        """
+        Calculate the bootstrap confidence interval of the overall WER over the counted utterances.
+
+        Args:
+            num_samples: The number of resamples.
+            confidence: The confidence level of the interval.
+            seed: The random seed.
+        Returns:
+            The WER, the lower and upper bounds of the interval and the standard error.
+        """
+        if self.utt_errors is None:
+            raise ValueError("The bootstrap requires the utterances recorded with Calculator(bootstrap=True).")
+        from compute_wer.bootstrap import bootstrap_wer
+
+        return bootstrap_wer(self.utt_errors, self.utt_lengths, num_samples, confidence, seed)
+
+    def paired_bootstrap(
+        self, other: "Calculator", num_samples: int = 1000, confidence: float = 0.95, seed: Optional[int] = None
+    ) -> Dict[str, float]:
+        """
+        Test the WER difference of another system scored on the same utterances in the same order.
+
+        Args:
+            other: The Calculator of the other system.
+            num_samples: The number of resamples.
+            confidence: The confidence level of the interval.
+            seed: The random seed.
+        Returns:
+            The WER difference (other - self), the lower and upper bounds of its interval and the two-sided p-value.
+        """
+        if self.utt_errors is None or other.utt_errors is None:
+            raise ValueError("The paired bootstrap requires the utterances recorded with Calculator(bootstrap=True).")
+        if self.utt_lengths != other.utt_lengths:
+            raise ValueError("The paired bootstrap requires the same utterances of the two systems.")
+        from compute_wer.bootstrap import paired_bootstrap
+
+        return paired_bootstrap(self.utt_errors, other.utt_errors, self.utt_lengths, num_samples, confidence, seed)
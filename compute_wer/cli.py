@@ -16,33 +16,226 @@ import codecs
 import logging
 import os
 import sys
+from collections import defaultdict
+from functools import partial
 
 import click
 
-from compute_wer.calculator import Calculator
-from compute_wer.utils import read_scp
+from compute_wer.confusion import KINDS
+from compute_wer.profiler import PROFILE_FORMATS
+from compute_wer.utils import default_cluster, merge_scp, normalize_token, read_scp
+from compute_wer.wer import DEFAULT_ENGINE, ENGINES, LongFormEngine, WeightedEngine
+from compute_wer.writer import OUTPUT_FORMATS, RecordWriter, open_writer, wer_record
 
-logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 
+class DefaultGroup(click.Group):
+    """The group running the default command when the first argument is not a command."""
 
-@click.command(help="Compute Word Error Rate (WER) and align recognition results with references.")
-@click.argument("ref")
-@click.argument("hyp")
+    def __init__(self, *args, default_command=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.default_command = default_command
+
+    def parse_args(self, ctx, args):
+        if not args or (args[0] not in self.commands and args[0] not in ctx.help_option_names):
+            args.insert(0, self.default_command)
+        return super().parse_args(ctx, args)
+
+
+@click.group(
+    cls=DefaultGroup,
+    default_command="score",
+    help="Compute Word Error Rate (WER) and align recognition results with references, "
+    "`compute-wer REF HYP` is short for `compute-wer score REF HYP`.",
+)
+def cli():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+
+def scoring_options(func):
+    """The options shared by the scoring commands."""
+    options = [
+        click.option("--align-to-hyp", is_flag=True, help="If set, align to hypothesis (default: align to reference)"),
+        click.option("--char", "-c", is_flag=True, help="Use character-level WER instead of word-level WER."),
+        click.option("--case-sensitive", "-cs", is_flag=True, help="Use case-sensitive matching."),
+        click.option(
+            "--remove-tag", "-rt", is_flag=True, default=True, help="Remove tags from the reference and hypothesis."
+        ),
+        click.option(
+            "--ignore-file", "-ig", type=click.Path(exists=True, dir_okay=False), help="Path to the ignore file."
+        ),
+        click.option("--ignore-punctuation", "-ip", is_flag=True, help="Ignore punctuation (except single quotes)."),
+        click.option(
+            "--rules-file",
+            "-r",
+            type=click.Path(exists=True, dir_okay=False),
+            help="Path to the rewrite rules file, one `PATTERN<TAB>REPLACEMENT` rule per line (`re:PATTERN` for a regex), "
+            "applied to the texts before tokenization.",
+        ),
+        click.option(
+            "--max-wer", "-mw", type=float, default=sys.maxsize, help="Filter hypotheses with WER <= this value."
+        ),
+        click.option("--cluster/--no-cluster", default=True, help="Print the WER for each cluster."),
+        click.option("--jobs", "-j", type=int, default=1, help="Number of worker processes used for scoring."),
+        click.option(
+            "--engine",
+            "-e",
+            type=click.Choice(list(ENGINES)),
+            default=DEFAULT_ENGINE,
+            help="Alignment engine, `compare` runs all the exact engines and checks that their counts agree, "
+            "`linear` is exact in O(sqrt(m) * n) memory, `longform` anchors the long utterances on the unique n-grams "
+            "and `weighted` minimizes the costs of --cost-file and --char-cost.",
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return bootstrap_options(func)
+
+
+def bootstrap_options(func):
+    """The options of the bootstrap confidence intervals."""
+    options = [
+        click.option(
+            "--bootstrap", "-b", type=int, default=0, help="Number of bootstrap resamples for the confidence intervals."
+        ),
+        click.option("--confidence", type=float, default=0.95, help="Confidence level of the bootstrap intervals."),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def confusion_options(func):
+    """The options of the confusion index."""
+    options = [
+        click.option(
+            "--confusions",
+            type=click.IntRange(min=0),
+            default=0,
+            help="Print the most frequent substitution, deletion and insertion pairs (builds the confusion index).",
+        ),
+        click.option(
+            "--save-confusions",
+            type=click.Path(dir_okay=False),
+            help="Save the confusion index (.npz) for `compute-wer confusions`.",
+        ),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def read_ignore_words(ignore_file, case_sensitive):
+    ignore_words = set()
+    if ignore_file is not None:
+        for line in codecs.open(ignore_file, encoding="utf-8"):
+            word = line.strip()
+            if len(word) > 0:
+                ignore_words.add(word if case_sensitive else word.upper())
+    return ignore_words
+
+
+def read_rules(rules_file, case_sensitive):
+    if rules_file is None:
+        return None
+    from compute_wer.rules import RewriteRules
+
+    try:
+        return RewriteRules.load(rules_file, case_sensitive)
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--rules-file")
+
+
+def read_groups(group_files):
+    # The groups are named `<file name>:<group>`, e.g., `utt2spk:spk1`, so the groups of different files never collide.
+    utt2groups = defaultdict(list)
+    for group_file in group_files:
+        name = os.path.basename(group_file)
+        for utt, group in read_scp(group_file).items():
+            utt2groups[utt].append(f"{name}:{group}")
+    return utt2groups
+
+
+@cli.command("score", help="Compute Word Error Rate (WER) and align recognition results with references.")
+@click.argument("ref", required=False)
+@click.argument("hyp", required=False)
 @click.argument("output-file", type=click.Path(dir_okay=False), required=False)
-@click.option("--align-to-hyp", is_flag=True, help="If set, align to hypothesis (default: align to reference)")
-@click.option("--char", "-c", is_flag=True, help="Use character-level WER instead of word-level WER.")
+@scoring_options
 @click.option(
     "--sort",
     "-s",
     type=click.Choice(["utt", "wer"], case_sensitive=False),
     help="Sort the hypotheses by utterance-id or WER in ascending order.",
 )
-@click.option("--case-sensitive", "-cs", is_flag=True, help="Use case-sensitive matching.")
-@click.option("--remove-tag", "-rt", is_flag=True, default=True, help="Remove tags from the reference and hypothesis.")
-@click.option("--ignore-file", "-ig", type=click.Path(exists=True, dir_okay=False), help="Path to the ignore file.")
-@click.option("--ignore-punctuation", "-ip", is_flag=True, help="Ignore punctuation (except single quotes).")
-@click.option("--max-wer", "-mw", type=float, default=sys.maxsize, help="Filter hypotheses with WER <= this value.")
-@click.option("--verbose", "-v", is_flag=True, default=True, help="Print verbose output.")
+@click.option("--verbose/--no-verbose", "-v/-nv", default=True, help="Print verbose output.")
+@click.option(
+    "--streaming", is_flag=True, help="Score scp files sorted by utterance-id (LC_ALL=C sort) with constant memory."
+)
+@click.option(
+    "--stdin",
+    is_flag=True,
+    help="Score the `REF<TAB>HYP` or `UTT<TAB>REF<TAB>HYP` lines of stdin and write to stdout, "
+    "instead of starting a process per utterance.",
+)
+@click.option(
+    "--index",
+    is_flag=True,
+    help="Read the scp or JSONL manifest files through a memory-mapped utterance-id index (saved as FILE.idx), "
+    "only the scored texts are decoded.",
+)
+@click.option(
+    "--save-state",
+    type=click.Path(dir_okay=False),
+    help="Save the statistics to a state file (gzipped if it ends with .gz) for `compute-wer merge`.",
+)
+@click.option(
+    "--cache-dir",
+    type=click.Path(file_okay=False),
+    help="Directory of the on-disk result cache, only the changed utterances are re-aligned.",
+)
+@click.option("--cache-size", type=int, default=1000000, help="Maximum number of entries in the result cache.")
+@click.option("--profile", is_flag=True, help="Print the wall time of each stage and the largest utterances.")
+@click.option("--profile-file", type=click.Path(dir_okay=False), help="Save the profile to a file, implies --profile.")
+@click.option(
+    "--profile-format",
+    type=click.Choice(PROFILE_FORMATS),
+    default="json",
+    help="Format of the profile file, `chrome` can be loaded in chrome://tracing or Perfetto.",
+)
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="text",
+    help="Output format, `jsonl`, `csv` and `parquet` write one row per utterance and a summary record "
+    "(the last JSON line, or FILE.summary.json).",
+)
+@click.option("--with-ops", is_flag=True, help="Write the edit operations of each utterance in the rows.")
+@click.option(
+    "--check-long-form",
+    is_flag=True,
+    help="With --engine longform, also compute the exact edit distances and report the deviation of the counts.",
+)
+@click.option(
+    "--cost-file",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Path to the `REF HYP COST` file of the weighted engine (e.g., `COLOUR COLOR 0.5`), `*` stands for the "
+    "missing token of the deletion and insertion costs, implies --engine weighted.",
+)
+@click.option(
+    "--char-cost",
+    is_flag=True,
+    help="Cost the substitutions by the character edit distance of the tokens (normalized to [0, 1]), "
+    "implies --engine weighted.",
+)
+@click.option(
+    "--group-file",
+    "-g",
+    multiple=True,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Path to an `utterance group` file (e.g., utt2spk), print the WER and SER of each group. "
+    "Can be given multiple times, the groups of all the files are accumulated in the same pass.",
+)
+@confusion_options
 def main(
     ref,
     hyp,
@@ -54,67 +247,546 @@ def main(
     remove_tag,
     ignore_file,
     ignore_punctuation,
+    rules_file,
     max_wer,
     verbose,
+    cluster,
+    jobs,
+    engine,
+    streaming,
+    stdin,
+    index,
+    save_state,
+    cache_dir,
+    cache_size,
+    profile,
+    profile_file,
+    profile_format,
+    output_format,
+    with_ops,
+    check_long_form,
+    cost_file,
+    char_cost,
+    group_file,
+    confusions,
+    save_confusions,
+    bootstrap,
+    confidence,
 ):
-    input_is_file = os.path.exists(ref)
-    assert os.path.exists(hyp) == input_is_file
+    if jobs > 1 and (stdin or streaming):
+        # The lines are scored one by one as they are read.
+        raise click.UsageError("--jobs cannot be combined with --stdin or --streaming.")
+    if stdin:
+        if ref is not None or hyp is not None or streaming or index or sort is not None:
+            raise click.UsageError("--stdin cannot be combined with REF, HYP, --streaming, --index or --sort.")
+        input_is_file = True
+    else:
+        if ref is None or hyp is None:
+            raise click.UsageError("Missing argument REF or HYP.")
+        input_is_file = os.path.exists(ref)
+        assert os.path.exists(hyp) == input_is_file
+        if group_file and not input_is_file:
+            raise click.UsageError("--group-file requires the utterance-ids of scp files or --stdin.")
+    if check_long_form and engine != LongFormEngine.name:
+        raise click.UsageError("--check-long-form requires --engine longform.")
+    if cost_file is not None or char_cost:
+        if engine not in (DEFAULT_ENGINE, WeightedEngine.name):
+            raise click.UsageError("--cost-file and --char-cost require --engine weighted.")
+        engine = WeightedEngine.name
+    if cache_dir is not None and not ENGINES[engine].exact:
+        # The engine is not part of the cache keys, so only the minimum edit distance alignments are cached.
+        raise click.UsageError(f"--cache-dir cannot be combined with --engine {engine}.")
+    # The engines with options are sent to the worker processes with them, and their counters are sent back.
+    if engine == LongFormEngine.name:
+        engine = LongFormEngine(check=check_long_form)
+    elif engine == WeightedEngine.name:
+        engine = WeightedEngine(char_cost=char_cost)
+        if cost_file is not None:
+            engine.load(cost_file, partial(normalize_token, case_sensitive=case_sensitive, remove_tag=remove_tag))
 
-    ignore_words = set()
-    if ignore_file is not None:
-        for line in codecs.open(ignore_file, encoding="utf-8"):
-            word = line.strip()
-            if len(word) > 0:
-                ignore_words.add(word if case_sensitive else word.upper())
-    calculator = Calculator(char, case_sensitive, remove_tag, ignore_words, ignore_punctuation, max_wer)
+    from compute_wer.calculator import Calculator
+
+    ignore_words = read_ignore_words(ignore_file, case_sensitive)
+    result_cache = None
+    if cache_dir is not None:
+        from compute_wer.cache import ResultCache
+
+        result_cache = ResultCache(cache_dir, cache_size)
+    calculator = Calculator(
+        char,
+        case_sensitive,
+        remove_tag,
+        ignore_words,
+        ignore_punctuation,
+        max_wer,
+        engine,
+        cluster,
+        result_cache=result_cache,
+        profile=profile or profile_file is not None,
+        confusion=confusions > 0 or save_confusions is not None,
+        rules=read_rules(rules_file, case_sensitive),
+        bootstrap=bootstrap > 0,
+    )
+    utt2groups = read_groups(group_file)
+    # The utterance-ids in the scoring order, used to name the largest utterances in the profile.
+    labels = []
+
+    fout = open_output(output_file, output_format, with_ops)
+    if stdin:
+        for line_number, line in enumerate(sys.stdin, 1):
+            fields = line.rstrip("\r\n").split("\t")
+            if len(fields) == 2:
+                fields.insert(0, str(line_number))
+            elif len(fields) != 3:
+                if line.strip():
+                    logging.warning("Skip the line %d of stdin with %d fields.", line_number, len(fields))
+                continue
+            utt, ref_text, hyp_text = fields
+            wer = calculator.calculate(ref_text, hyp_text, utt2groups.get(utt))
+            if calculator.profiler is not None:
+                labels.append(utt)
+            if verbose and wer.wer <= max_wer:
+                with calculator.stage("write"):
+                    write_wer(fout, utt, wer)
+                    if not isinstance(fout, RecordWriter):
+                        # The lines may be written by an interactive pipeline waiting for each result.
+                        fout.flush()
+        finish(fout, calculator, input_is_file, save_state, bootstrap, confidence, confusions, save_confusions)
+        report_profile(calculator, labels, profile_file, profile_format)
+        return
+    if streaming:
+        if not input_is_file or sort == "wer" or index:
+            raise click.UsageError("--streaming requires scp files and cannot be combined with --sort wer or --index.")
+        scp = merge_scp(ref, hyp)
+        if calculator.profiler is not None:
+            scp = calculator.profiler.iterate("read_scp", scp)
+        for utt, ref_text, hyp_text in scp:
+            if ref_text is None:
+                calculator.ser.ml += 1
+                continue
+            if hyp_text is None:
+                if align_to_hyp:
+                    calculator.ser.mh += 1
+                    continue
+                logging.warning("No hypothesis found for %s, use empty string as hypothesis.", utt)
+                hyp_text = ""
+            wer = calculator.calculate(ref_text, hyp_text, utt2groups.get(utt))
+            if calculator.profiler is not None:
+                labels.append(utt)
+            if verbose and wer.wer <= max_wer:
+                with calculator.stage("write"):
+                    write_wer(fout, utt, wer)
+        finish(fout, calculator, input_is_file, save_state, bootstrap, confidence, confusions, save_confusions)
+        report_profile(calculator, labels, profile_file, profile_format)
+        return
 
     wers = []
     if input_is_file:
-        hyps = read_scp(hyp)
-        refs = read_scp(ref)
-        ref_utts = set(refs.keys())
-        hyp_utts = set(hyps.keys())
+        if index:
+            with calculator.stage("read_scp"):
+                utts, pairs, calculator.ser.ml, calculator.ser.mh = read_indexed(ref, hyp, align_to_hyp)
+        else:
+            with calculator.stage("read_scp"):
+                hyps = read_scp(hyp)
+                refs = read_scp(ref)
+            ref_utts = set(refs.keys())
+            hyp_utts = set(hyps.keys())
 
-        if not align_to_hyp:
-            for utt in ref_utts - hyp_utts:
-                hyps[utt] = ""
-                hyp_utts.add(utt)
-                logging.warning("No hypothesis found for %s, use empty string as hypothesis.", utt)
-        for utt in hyp_utts & ref_utts:
-            wer = calculator.calculate(refs[utt], hyps[utt])
-            if wer.wer <= max_wer:
+            if not align_to_hyp:
+                for utt in ref_utts - hyp_utts:
+                    hyps[utt] = ""
+                    hyp_utts.add(utt)
+                    logging.warning("No hypothesis found for %s, use empty string as hypothesis.", utt)
+            utts = list(hyp_utts & ref_utts)
+            pairs = [(refs[utt], hyps[utt]) for utt in utts]
+            calculator.ser.ml, calculator.ser.mh = len(hyp_utts - ref_utts), len(ref_utts - hyp_utts)
+        labels = utts
+        groups = [utt2groups.get(utt, ()) for utt in utts]
+        for utt, wer in zip(utts, calculator.calculate_batch(pairs, jobs, align=verbose, groups=groups)):
+            if verbose and wer.wer <= max_wer:
                 wers.append((utt, wer))
     else:
         wer = calculator.calculate(ref, hyp)
         wers.append((None, wer))
 
-    fout = sys.stdout
-    if output_file is None:
-        fout.write("\n")
+    with calculator.stage("write"):
+        if verbose:
+            if sort is not None:
+                wers = sorted(wers, key=lambda x: x[0] if sort == "utt" else x[1].wer)
+            for utt, wer in wers:
+                write_wer(fout, utt, wer)
+    finish(fout, calculator, input_is_file, save_state, bootstrap, confidence, confusions, save_confusions)
+    report_profile(calculator, labels, profile_file, profile_format)
+
+
+@cli.command("merge", help="Merge the state files saved by `compute-wer --save-state` and print the overall WER.")
+@click.argument("states", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--output-file", "-o", type=click.Path(dir_okay=False), help="Path to the output file.")
+@click.option("--save-state", type=click.Path(dir_okay=False), help="Save the merged statistics to a state file.")
+@bootstrap_options
+@confusion_options
+def merge(states, output_file, save_state, bootstrap, confidence, confusions, save_confusions):
+    from compute_wer.calculator import Calculator
+
+    calculator = Calculator.load(states[0])
+    for state in states[1:]:
+        try:
+            calculator.merge(Calculator.load(state))
+        except ValueError as e:
+            raise click.UsageError(f"{state}: {e}")
+    if (confusions > 0 or save_confusions is not None) and calculator.confusion is None:
+        raise click.UsageError("The states were saved without the confusion index (--confusions).")
+    if bootstrap > 0 and calculator.utt_errors is None:
+        raise click.UsageError("The states were saved without the errors of the utterances (--bootstrap).")
+    fout = open_output(output_file)
+    finish(fout, calculator, True, save_state, bootstrap, confidence, confusions, save_confusions)
+
+
+@cli.command("confusions", help="Query a confusion index saved by `compute-wer --save-confusions`.")
+@click.argument("index", type=click.Path(exists=True, dir_okay=False))
+@click.option("--top", "-k", type=click.IntRange(min=0), default=20, help="Number of the most frequent confusions.")
+@click.option("--kind", type=click.Choice(KINDS), help="Only print the substitutions, deletions or insertions.")
+@click.option("--token", "-t", help="Only print the confusions of a token, on either side.")
+@click.option("--cluster", help="Only print the confusions of the tokens of a cluster (e.g., English).")
+@click.option("--output-file", "-o", type=click.Path(dir_okay=False), help="Path to the output file.")
+def confusions(index, top, kind, token, cluster, output_file):
+    from compute_wer.confusion import ConfusionIndex
+
+    index = ConfusionIndex.load(index)
+    tokens = None
+    if token is not None:
+        tokens = [token]
+    elif cluster is not None:
+        tokens = [token for token in index.tokens if token and default_cluster(token) == cluster]
+    fout = open_output(output_file)
+    totals = index.totals()
+    fout.write(f"Sub={totals['sub']} Del={totals['del']} Ins={totals['ins']} Pairs={len(index)}\n")
+    write_confusions(fout, index.query(top, kind, tokens))
+    fout.close()
+
+
+@cli.command("compare", help="Compare the WERs of several systems against the same references.")
+@click.argument("ref", type=click.Path(exists=True, dir_okay=False))
+@click.argument("hyps", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@scoring_options
+@click.option("--output-file", "-o", type=click.Path(dir_okay=False), help="Path to the output file.")
+def compare(
+    ref,
+    hyps,
+    align_to_hyp,
+    char,
+    case_sensitive,
+    remove_tag,
+    ignore_file,
+    ignore_punctuation,
+    rules_file,
+    max_wer,
+    cluster,
+    jobs,
+    engine,
+    bootstrap,
+    confidence,
+    output_file,
+):
+    from compute_wer.calculator import Calculator
+
+    ignore_words = read_ignore_words(ignore_file, case_sensitive)
+    options = {
+        "to_char": char,
+        "case_sensitive": case_sensitive,
+        "remove_tag": remove_tag,
+        "ignore_words": ignore_words,
+        "ignore_punctuation": ignore_punctuation,
+        "max_wer": max_wer,
+        "engine": engine,
+        "cluster": cluster,
+        "rules": read_rules(rules_file, case_sensitive),
+        "bootstrap": bootstrap > 0,
+    }
+    # Normalize the references once for all the systems.
+    normalize = Calculator(**options).normalize
+    refs = {utt: normalize(text) for utt, text in read_scp(ref).items()}
+
+    score = partial(score_system, options, refs, align_to_hyp=align_to_hyp)
+    if jobs > 1:
+        from concurrent.futures import ProcessPoolExecutor
+
+        with ProcessPoolExecutor(min(jobs, len(hyps))) as executor:
+            results = list(executor.map(score, hyps))
     else:
-        fout = codecs.open(output_file, "w", encoding="utf-8")
-
-    if verbose:
-        if sort is not None:
-            wers = sorted(wers, key=lambda x: x[0] if sort == "utt" else x[1].wer)
-        for utt, wer in wers:
-            if utt is not None:
-                fout.write(f"utt: {utt}\n")
-            fout.write(f"WER: {wer}\n")
-            fout.write(f"ref: {' '.join(wer.reference)}\n")
-            fout.write(f"hyp: {' '.join(wer.hypothesis)}\n\n")
+        results = [score(hyp) for hyp in hyps]
+
+    calculators = []
+    for state, _, hits in results:
+        if options["rules"] is not None:
+            options["rules"].merge_hits(hits)
+        calculator = Calculator(**options)
+        calculator.load_state_dict(state)
+        calculators.append(calculator)
+    baseline = results[0][1]
+    table = [["System", "WER", "N", "Cor", "Sub", "Del", "Ins", "SER", "ML", "MH", "Win", "Tie", "Loss"]]
+    for index, (hyp, calculator, (_, errors, _)) in enumerate(zip(hyps, calculators, results)):
+        wer, _ = calculator.overall()
+        ser = calculator.ser
+        row = [hyp, f"{wer.wer * 100:4.2f} %", wer.all, *wer.counts, f"{ser.ser * 100:4.2f} %", ser.ml, ser.mh]
+        if index == 0:
+            row.extend(["-"] * 3)
+        else:
+            # Count the utterances with fewer, equal and more errors than the first system.
+            diffs = [errors[utt] - baseline[utt] for utt in errors.keys() & baseline.keys()]
+            row.extend(
+                [sum(diff < 0 for diff in diffs), sum(diff == 0 for diff in diffs), sum(diff > 0 for diff in diffs)]
+            )
+        table.append(row)
+
+    fout = open_output(output_file)
+    fout.write("===========================================================================\n")
+    write_table(fout, table)
+    if bootstrap > 0:
+        from compute_wer.bootstrap import paired_bootstrap
+
+        # The paired bootstrap against the first system on the utterances scored by both systems.
+        table = [["System", "WER CI", "Delta", "Delta CI", "p-value"]]
+        for index, (hyp, calculator, (_, errors, _)) in enumerate(zip(hyps, calculators, results)):
+            row = [hyp, format_interval(calculator.bootstrap(bootstrap, confidence, seed=0), confidence)]
+            if index == 0:
+                row.extend(["-"] * 3)
+            else:
+                utts = [utt for utt in baseline if utt in errors]
+                result = paired_bootstrap(
+                    [baseline[utt] for utt in utts],
+                    [errors[utt] for utt in utts],
+                    [len(refs[utt]) for utt in utts],
+                    bootstrap,
+                    confidence,
+                    seed=0,
+                )
+                row.extend([f"{result['delta'] * 100:+4.2f} %", format_interval(result, confidence), result["p_value"]])
+            table.append(row)
+        fout.write("\n")
+        write_table(fout, table)
+    if cluster:
+        names = list(dict.fromkeys(name for calculator in calculators for name in calculator.overall()[1]))
+        table = [["System", *names]]
+        for hyp, calculator in zip(hyps, calculators):
+            cluster_wers = calculator.overall()[1]
+            table.append(
+                [hyp, *(f"{cluster_wers[name].wer * 100:4.2f} %" if name in cluster_wers else "-" for name in names)]
+            )
+        fout.write("\n")
+        write_table(fout, table)
+    fout.write("===========================================================================\n")
+    fout.close()
+    log_rules(options["rules"])
+
+
+def score_system(options, refs, hyp, align_to_hyp):
+    from compute_wer.calculator import Calculator
+
+    calculator = Calculator(**options)
+    hyps = read_scp(hyp)
+    errors = {}
+    for utt, reference in refs.items():
+        if utt not in hyps:
+            if align_to_hyp:
+                calculator.ser.mh += 1
+                continue
+            logging.warning("No hypothesis found for %s in %s, use empty string as hypothesis.", utt, hyp)
+            hyps[utt] = ""
+        wer = calculator.calculate_normalized(reference, calculator.normalize(hyps[utt]))
+        # The utterances filtered by max_wer are not compared.
+        if not wer.filtered:
+            errors[utt] = wer.replace + wer.delete + wer.insert
+    calculator.ser.ml = len(hyps.keys() - refs.keys())
+    # The rules of a worker process are kept across the systems (see `shared_instance`), so their hits are reset.
+    rules = calculator.normalizer.rules
+    return calculator.state_dict(), errors, rules.pop_hits() if rules is not None else {}
+
+
+def read_indexed(ref, hyp, align_to_hyp):
+    from compute_wer.reader import ScpReader
+
+    with ScpReader(ref) as refs, ScpReader(hyp) as hyps:
+        hyp_utts = list(hyps)
+        utts = [utt for utt, found in zip(hyp_utts, refs.contains(hyp_utts)) if found]
+        ml, mh = len(hyps) - len(utts), len(refs) - len(utts)
+        if not align_to_hyp:
+            ref_utts = list(refs)
+            for utt, found in zip(ref_utts, hyps.contains(ref_utts)):
+                if not found:
+                    utts.append(utt)
+                    logging.warning("No hypothesis found for %s, use empty string as hypothesis.", utt)
+            mh = 0
+        pairs = list(zip(refs.texts(utts), hyps.texts(utts, default="")))
+    return utts, pairs, ml, mh
+
+
+def write_table(fout, table):
+    widths = [max(len(str(row[i])) for row in table) for i in range(len(table[0]))]
+    for row in table:
+        fout.write(
+            "  ".join(
+                str(cell).rjust(width) if i > 0 else str(cell).ljust(width)
+                for i, (cell, width) in enumerate(zip(row, widths))
+            ).rstrip()
+            + "\n"
+        )
+
+
+def open_output(output_file, output_format="text", ops=False):
+    if output_format != "text":
+        return open_writer(output_format, output_file, ops)
+    if output_file is None:
+        sys.stdout.write("\n")
+        return sys.stdout
+    return codecs.open(output_file, "w", encoding="utf-8")
+
+
+def finish(
+    fout,
+    calculator,
+    input_is_file,
+    save_state,
+    bootstrap=0,
+    confidence=0.95,
+    confusions=0,
+    save_confusions=None,
+):
+    with calculator.stage("write"):
+        if isinstance(fout, RecordWriter):
+            fout.close(summary_record(calculator, input_is_file, bootstrap, confidence, confusions))
+        else:
+            write_summary(fout, calculator, input_is_file, bootstrap, confidence, confusions)
+    if save_confusions is not None:
+        calculator.confusion.save(save_confusions)
+    log_engines(calculator.engine)
+    log_rules(calculator.normalizer.rules)
+    if calculator.result_cache is not None:
+        result_cache = calculator.result_cache
+        logging.info("Result cache: %d hits, %d misses", result_cache.hits, result_cache.misses)
+        result_cache.close()
+    if save_state is not None:
+        calculator.save(save_state)
+
+
+def report_profile(calculator, labels, profile_file, profile_format):
+    profiler = calculator.profiler
+    if profiler is None:
+        return
+    logging.info("Profile:\n%s", profiler.format(labels))
+    logging.info("Cache: %s", calculator.cache_info())
+    if profile_file is not None:
+        profiler.save(profile_file, profile_format, labels)
+
+
+def log_engines(engine):
+    if engine.name == "compare":
+        for name, seconds in engine.times.items():
+            logging.info("Engine %s: %.3f seconds", name, seconds)
+        logging.info("Engines disagree on %d utterances", engine.mismatches)
+    elif engine.name == LongFormEngine.name:
+        longform = engine
+        logging.info("Long-form: %d utterances anchored into %d segments", longform.anchored, longform.segments)
+        if longform.checked > 0:
+            logging.info(
+                "Long-form: %d more edits than the exact alignments of %d utterances",
+                longform.deviation,
+                longform.checked,
+            )
+    elif engine.name == WeightedEngine.name:
+        logging.info(
+            "Weighted: cost %.2f over %d reference tokens of %d utterances",
+            engine.cost,
+            engine.ref_tokens,
+            engine.aligned,
+        )
+
+
+def log_rules(rules, k=10):
+    if rules is None:
+        return
+    logging.info("Rules: %d hits of %d rules", sum(rules.hits.values()), len(rules))
+    for rule, hits in rules.report(k):
+        logging.info("Rule %s: %d hits", rule, hits)
+
+
+def write_wer(fout, utt, wer):
+    if isinstance(fout, RecordWriter):
+        fout.write(utt, wer)
+        return
+    if utt is not None:
+        fout.write(f"utt: {utt}\n")
+    fout.write(f"WER: {wer}\n")
+    fout.write(f"ref: {' '.join(wer.reference)}\n")
+    fout.write(f"hyp: {' '.join(wer.hypothesis)}\n\n")
+
+
+def format_interval(result, confidence):
+    return f"{confidence * 100:g}% CI [{result['low'] * 100:4.2f} %, {result['high'] * 100:4.2f} %]"
+
+
+def write_confusions(fout, pairs):
+    # The missing side of the deletions and insertions is printed as `*`.
+    table = [["Ref", "Hyp", "Count"]] + [[ref or "*", hyp or "*", count] for ref, hyp, count in pairs]
+    write_table(fout, table)
+
+
+def write_summary(fout, calculator, input_is_file, bootstrap=0, confidence=0.95, confusions=0):
     fout.write("===========================================================================\n")
     wer, cluster_wers = calculator.overall()
     fout.write(f"Overall -> {wer}\n")
+    if bootstrap > 0:
+        fout.write(f"Bootstrap -> {format_interval(calculator.bootstrap(bootstrap, confidence, seed=0), confidence)}\n")
     for cluster, wer in cluster_wers.items():
         fout.write(f"{cluster} -> {wer}\n")
     if input_is_file:
-        # ML: Missing Labels(Extra Hypotheses)
-        # MH: Missing Hypotheses(Extra Labels)
-        fout.write(f"SER -> {calculator.ser} ML={len(hyp_utts - ref_utts)} MH={len(ref_utts - hyp_utts)}\n")
+        ser = calculator.ser
+        fout.write(f"SER -> {ser} ML={ser.ml} MH={ser.mh}\n")
+    weighted = weighted_record(calculator)
+    if weighted is not None:
+        fout.write(f"Weighted -> {weighted['wer'] * 100:4.2f} % N={weighted['n']} Cost={weighted['cost']:.2f}\n")
+    if len(calculator.groups) > 0:
+        table = [["Group", "WER", "N", "Cor", "Sub", "Del", "Ins", "SER", "Utts"]]
+        for name, (wer, ser) in calculator.groups.items():
+            table.append([name, f"{wer.wer * 100:4.2f} %", wer.all, *wer.counts, f"{ser.ser * 100:4.2f} %", ser.all])
+        fout.write("Groups ->\n")
+        write_table(fout, table)
+    if confusions > 0:
+        fout.write(f"Confusions -> top {confusions}\n")
+        write_confusions(fout, calculator.confusions(confusions))
     fout.write("===========================================================================\n")
     fout.close()
 
 
+def summary_record(calculator, input_is_file, bootstrap=0, confidence=0.95, confusions=0):
+    wer, cluster_wers = calculator.overall()
+    summary = {"overall": wer_record(wer)}
+    if bootstrap > 0:
+        summary["bootstrap"] = {"confidence": confidence, **calculator.bootstrap(bootstrap, confidence, seed=0)}
+    summary["clusters"] = {cluster: wer_record(wer) for cluster, wer in cluster_wers.items()}
+    if input_is_file:
+        ser = calculator.ser
+        summary["ser"] = {"ser": ser.ser, "n": ser.all, "cor": ser.cor, "err": ser.err, "ml": ser.ml, "mh": ser.mh}
+    weighted = weighted_record(calculator)
+    if weighted is not None:
+        summary["weighted"] = weighted
+    if len(calculator.groups) > 0:
+        summary["groups"] = {
+            name: {**wer_record(wer), "ser": ser.ser, "utts": ser.all} for name, (wer, ser) in calculator.groups.items()
+        }
+    if confusions > 0:
+        pairs = calculator.confusions(confusions)
+        summary["confusions"] = [{"ref": ref, "hyp": hyp, "count": count} for ref, hyp, count in pairs]
+    return summary
+
+
+def weighted_record(calculator):
+    # The weighted WER of the aligned utterances, besides the counts of the alignments chosen by the costs.
+    engine = calculator.engine
+    if not isinstance(engine, WeightedEngine) or engine.aligned == 0:
+        return None
+    return {"wer": engine.wer, "n": engine.ref_tokens, "cost": engine.cost, "utts": engine.aligned}
+
+
 if __name__ == "__main__":
-    main()
+    cli()
@@ -0,0 +1,232 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from compute_wer.wer import Alignment
+
+# The kinds of the confusions, the deletions have an empty hypothesis token and the insertions an empty reference token.
+KINDS = ("sub", "del", "ins")
+# The id of the empty token, the reference and hypothesis ids are packed into `ref_id << ID_BITS | hyp_id`.
+EMPTY = 0
+ID_BITS = 32
+
+
+class ConfusionIndex:
+    """
+    The sparse (reference token, hypothesis token) -> count table of the substitutions, deletions and insertions.
+
+    The tokens are interned into ids, the empty token (id 0) stands for the missing side of the deletions and
+    insertions, and each pair of ids is packed into a single integer key. The queries run over the columnar
+    arrays of the pairs, built once after the last update, so they do not rescan the alignments.
+    """
+
+    def __init__(self):
+        self.tokens = [""]
+        self.vocab = {"": EMPTY}
+        self.pairs = Counter()
+        self._arrays = None
+
+    def index(self, token: str) -> int:
+        """
+        Get the id of a token, adding it to the vocabulary if needed.
+
+        Args:
+            token: The token.
+        Returns:
+            The id of the token.
+        """
+        index = self.vocab.get(token)
+        if index is None:
+            index = self.vocab[token] = len(self.tokens)
+            self.tokens.append(token)
+        return index
+
+    def add(self, alignment: Alignment):
+        """
+        Add the substitutions, deletions and insertions of an alignment.
+
+        Args:
+            alignment: The alignment of the reference and hypothesis.
+        """
+        keys = []
+        i, j = 0, 0
+        for code in alignment.ops:
+            if code == "S":
+                keys.append(self.index(alignment.ref[i]) << ID_BITS | self.index(alignment.hyp[j]))
+            elif code == "D":
+                keys.append(self.index(alignment.ref[i]) << ID_BITS)
+            elif code == "I":
+                keys.append(self.index(alignment.hyp[j]))
+            i += code != "I"
+            j += code != "D"
+        if keys:
+            self.pairs.update(keys)
+            self._arrays = None
+
+    def add_pair(self, ref: str, hyp: str, count: int = 1):
+        """
+        Add the count of a pair of tokens.
+
+        Args:
+            ref: The reference token, empty for an insertion.
+            hyp: The hypothesis token, empty for a deletion.
+            count: The count of the pair.
+        """
+        self.pairs[self.index(ref) << ID_BITS | self.index(hyp)] += count
+        self._arrays = None
+
+    def merge(self, other: "ConfusionIndex"):
+        """
+        Merge the counts of another ConfusionIndex.
+
+        Args:
+            other: The other ConfusionIndex.
+        """
+        mask = (1 << ID_BITS) - 1
+        for key, count in other.pairs.items():
+            self.add_pair(other.tokens[key >> ID_BITS], other.tokens[key & mask], count)
+
+    def arrays(self):
+        """
+        Get the columnar arrays of the pairs, cached until the next update.
+
+        Returns:
+            The reference ids, the hypothesis ids and the counts of the pairs.
+        """
+        if self._arrays is None:
+            import numpy as np
+
+            keys = np.fromiter(self.pairs.keys(), dtype=np.int64, count=len(self.pairs))
+            counts = np.fromiter(self.pairs.values(), dtype=np.int64, count=len(self.pairs))
+            self._arrays = keys >> ID_BITS, keys & ((1 << ID_BITS) - 1), counts
+        return self._arrays
+
+    def query(
+        self, k: Optional[int] = 10, kind: Optional[str] = None, tokens: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, str, int]]:
+        """
+        Get the most frequent confusions.
+
+        Args:
+            k: The number of the confusions (None for all).
+            kind: Only get the confusions of a kind, one of `sub`, `del` and `ins` (default: all kinds).
+            tokens: Only get the confusions with one of the tokens on either side, e.g., a token or a cluster.
+        Returns:
+            The list of (reference token, hypothesis token, count), by descending count.
+        """
+        import numpy as np
+
+        if k is not None and k < 0:
+            raise ValueError(f"The number of the confusions must be non-negative: {k}")
+        if kind is not None and kind not in KINDS:
+            raise ValueError(f"Unknown confusion kind: {kind}, choose from {list(KINDS)}")
+        if k == 0:
+            return []
+        ref, hyp, counts = self.arrays()
+        mask = np.ones(len(counts), dtype=bool)
+        if kind == "sub":
+            mask &= (ref != EMPTY) & (hyp != EMPTY)
+        elif kind == "del":
+            mask &= hyp == EMPTY
+        elif kind == "ins":
+            mask &= ref == EMPTY
+        if tokens is not None:
+            ids = np.array([self.vocab[token] for token in set(tokens) if token in self.vocab], dtype=np.int64)
+            mask &= np.isin(ref, ids) | np.isin(hyp, ids)
+        indices = np.flatnonzero(mask)
+        if k is not None and len(indices) > k:
+            indices = indices[np.argpartition(-counts[indices], k - 1)[:k]]
+        # Break the ties by the tokens, so that the order does not depend on the order of the updates.
+        pairs = zip(ref[indices].tolist(), hyp[indices].tolist(), counts[indices].tolist())
+        result = [(self.tokens[r], self.tokens[h], c) for r, h, c in pairs]
+        return sorted(result, key=lambda pair: (-pair[2], pair[0], pair[1]))
+
+    def totals(self) -> Dict[str, int]:
+        """
+        Get the total count of each kind of confusion.
+
+        Returns:
+            The number of the substitutions, deletions and insertions.
+        """
+        ref, hyp, counts = self.arrays()
+        deleted, inserted = hyp == EMPTY, ref == EMPTY
+        return {
+            "sub": int(counts[~deleted & ~inserted].sum()),
+            "del": int(counts[deleted].sum()),
+            "ins": int(counts[inserted].sum()),
+        }
+
+    def __len__(self) -> int:
+        return len(self.pairs)
+
+    def state_dict(self) -> Dict[str, Any]:
+        """
+        Get the state of the index, which can be serialized to JSON.
+
+        Returns:
+            The vocabulary and the (reference id, hypothesis id, count) of each pair.
+        """
+        ref, hyp, counts = self.arrays()
+        return {"tokens": self.tokens, "pairs": list(zip(ref.tolist(), hyp.tolist(), counts.tolist()))}
+
+    @staticmethod
+    def from_state_dict(state: Dict[str, Any]) -> "ConfusionIndex":
+        """
+        Create an index from a state.
+
+        Args:
+            state: The state returned by `state_dict`.
+        Returns:
+            The index.
+        """
+        index = ConfusionIndex()
+        for ref, hyp, count in state["pairs"]:
+            index.add_pair(state["tokens"][ref], state["tokens"][hyp], count)
+        return index
+
+    def save(self, path: str):
+        """
+        Save the index to a compressed NumPy archive.
+
+        Args:
+            path: The path to the index (.npz).
+        """
+        import numpy as np
+
+        ref, hyp, counts = self.arrays()
+        # The tokens never contain whitespace, so they are joined by newlines.
+        tokens = np.frombuffer("\n".join(self.tokens).encode("utf-8"), dtype=np.uint8)
+        np.savez_compressed(path, tokens=tokens, ref=ref, hyp=hyp, counts=counts)
+
+    @staticmethod
+    def load(path: str) -> "ConfusionIndex":
+        """
+        Load an index saved by `save`.
+
+        Args:
+            path: The path to the index (.npz).
+        Returns:
+            The index.
+        """
+        import numpy as np
+
+        with np.load(path) as data:
+            index = ConfusionIndex()
+            index.tokens = data["tokens"].tobytes().decode("utf-8").split("\n")
+            index.vocab = {token: i for i, token in enumerate(index.tokens)}
+            keys = data["ref"] << ID_BITS | data["hyp"]
+            index.pairs = Counter(dict(zip(keys.tolist(), data["counts"].tolist())))
+        return index
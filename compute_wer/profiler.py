@@ -0,0 +1,217 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import heapq
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence
+
+PROFILE_FORMATS = ("text", "json", "chrome")
+
+
+class Profiler:
+    """
+    Collect the cumulative wall time and the number of calls of each stage, and the largest utterances.
+
+    The utterances are ranked by the product of the reference and hypothesis lengths, which bounds the
+    cost of their alignment, so they are known even when the alignment runs in the worker processes.
+    """
+
+    def __init__(self, top_k: int = 10, max_events: int = 100000):
+        """
+        Create an empty profile.
+
+        Args:
+            top_k: The number of the largest utterances kept.
+            max_events: The maximum number of the trace events kept, the later events are only counted.
+        """
+        self.top_k = top_k
+        self.max_events = max_events
+        self.seconds = defaultdict(float)
+        self.calls = defaultdict(int)
+        self.events = []
+        self.dropped_events = 0
+        self.utterances = 0
+        self.largest = []
+        self.origin = time.perf_counter()
+
+    def add(self, stage: str, start: float, seconds: float):
+        """
+        Add a call of a stage.
+
+        Args:
+            stage: The name of the stage.
+            start: The start time of the call, from `time.perf_counter`.
+            seconds: The wall time of the call.
+        """
+        self.seconds[stage] += seconds
+        self.calls[stage] += 1
+        if len(self.events) < self.max_events:
+            self.events.append((stage, start - self.origin, seconds, threading.get_ident()))
+        else:
+            self.dropped_events += 1
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        """
+        Time a block as a call of a stage.
+
+        Args:
+            stage: The name of the stage.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, start, time.perf_counter() - start)
+
+    def wrap(self, stage: str, func: Callable) -> Callable:
+        """
+        Time every call of a function as a call of a stage.
+
+        Args:
+            stage: The name of the stage.
+            func: The function.
+        Returns:
+            The timed function.
+        """
+
+        @wraps(func)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.add(stage, start, time.perf_counter() - start)
+
+        return timed
+
+    def iterate(self, stage: str, iterable: Iterable) -> Iterator:
+        """
+        Time every step of an iterator (e.g., reading a file) as a call of a stage.
+
+        Args:
+            stage: The name of the stage.
+            iterable: The iterable.
+        Returns:
+            The timed iterator.
+        """
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(stage, start, time.perf_counter() - start)
+                return
+            self.add(stage, start, time.perf_counter() - start)
+            yield item
+
+    def utterance(self, ref_len: int, hyp_len: int):
+        """
+        Record the lengths of a scored utterance.
+
+        Args:
+            ref_len: The number of the reference tokens.
+            hyp_len: The number of the hypothesis tokens.
+        """
+        item = (ref_len * hyp_len, -self.utterances, ref_len, hyp_len)
+        if len(self.largest) < self.top_k:
+            heapq.heappush(self.largest, item)
+        elif item > self.largest[0]:
+            heapq.heapreplace(self.largest, item)
+        self.utterances += 1
+
+    def report(self, labels: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """
+        Get the profile.
+
+        Args:
+            labels: The utterance-ids in the scoring order, used to name the largest utterances.
+        Returns:
+            The wall time and the number of calls of each stage, and the largest utterances.
+        """
+        stages = {
+            stage: {"seconds": round(self.seconds[stage], 6), "calls": self.calls[stage]}
+            for stage in sorted(self.seconds, key=self.seconds.get, reverse=True)
+        }
+        largest = []
+        for product, index, ref_len, hyp_len in sorted(self.largest, reverse=True):
+            index = -index
+            utt = labels[index] if labels is not None and index < len(labels) else index
+            largest.append({"utt": utt, "ref_tokens": ref_len, "hyp_tokens": hyp_len, "product": product})
+        return {
+            "wall_seconds": round(time.perf_counter() - self.origin, 6),
+            "stages": stages,
+            "utterances": self.utterances,
+            "largest_utterances": largest,
+        }
+
+    def format(self, labels: Optional[Sequence[str]] = None) -> str:
+        """
+        Format the profile as a human readable breakdown.
+
+        Args:
+            labels: The utterance-ids in the scoring order, used to name the largest utterances.
+        Returns:
+            The breakdown of the stages and the largest utterances.
+        """
+        report = self.report(labels)
+        # The stages may be nested, e.g., cluster in update.
+        lines = [f"wall time: {report['wall_seconds']:.3f} s"]
+        lines.append(f"{'stage':<16}{'seconds':>12}{'calls':>12}{'us/call':>12}")
+        for name, stage in report["stages"].items():
+            per_call = stage["seconds"] / stage["calls"] * 1e6
+            lines.append(f"{name:<16}{stage['seconds']:>12.3f}{stage['calls']:>12}{per_call:>12.1f}")
+        lines.append(f"largest of {report['utterances']} utterances (ref tokens x hyp tokens):")
+        for utt in report["largest_utterances"]:
+            lines.append(f"  {utt['utt']}: {utt['ref_tokens']} x {utt['hyp_tokens']} = {utt['product']}")
+        return "\n".join(lines)
+
+    def chrome_trace(self) -> Dict[str, Any]:
+        """
+        Get the trace events in the Chrome trace format, which can be loaded in `chrome://tracing` or Perfetto.
+
+        Returns:
+            The trace.
+        """
+        pid = os.getpid()
+        events = [
+            {"name": stage, "ph": "X", "ts": start * 1e6, "dur": seconds * 1e6, "pid": pid, "tid": tid}
+            for stage, start, seconds, tid in self.events
+        ]
+        return {"traceEvents": events, "otherData": {"dropped_events": self.dropped_events}}
+
+    def save(self, path: str, fmt: str = "json", labels: Optional[Sequence[str]] = None):
+        """
+        Save the profile.
+
+        Args:
+            path: The path to the profile.
+            fmt: The format of the profile, one of `text`, `json` and `chrome`.
+            labels: The utterance-ids in the scoring order, used to name the largest utterances.
+        """
+        if fmt not in PROFILE_FORMATS:
+            raise ValueError(f"Unsupported profile format: {fmt}")
+        import json
+
+        with open(path, "w", encoding="utf-8") as fout:
+            if fmt == "text":
+                fout.write(self.format(labels) + "\n")
+            else:
+                json.dump(self.report(labels) if fmt == "json" else self.chrome_trace(), fout, ensure_ascii=False)
@@ -0,0 +1,328 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import logging
+import mmap
+import os
+import zipfile
+from collections.abc import Mapping
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# The bytes ending an utterance-id in the scp files.
+DELIMITERS = b" \t\r\n\v\f"
+ID_KEYS = ("key", "utt", "utt_id", "id")
+TEXT_KEYS = ("text", "txt", "sentence")
+# The size of the chunks scanned at once, bounds the memory of the vectorized scan.
+CHUNK_SIZE = 1 << 24
+
+
+class ScpReader(Mapping):
+    """
+    The read-only mapping of utterance to text of a memory-mapped scp or JSONL manifest file.
+
+    The file is indexed once by utterance-id, the index is sorted by utterance-id and holds the byte span of
+    each text, so only the texts of the looked up utterances are decoded. The index is saved next to the file
+    (`<path>.idx`) with the size and modification time of the file, and reused as long as both are unchanged.
+    If the index cannot be saved (e.g., a read-only directory), it is only kept in memory.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fmt: Optional[str] = None,
+        index_path: Optional[str] = None,
+        save_index: bool = True,
+        id_key: Optional[str] = None,
+        text_key: Optional[str] = None,
+    ):
+        """
+        Open and index the file.
+
+        Args:
+            path: The path to the scp (`utterance text` per line) or JSONL manifest file.
+            fmt: The format of the file, `scp` or `jsonl` (default: `jsonl` for the .jsonl/.json files).
+            index_path: The path to the index (default: `<path>.idx`).
+            save_index: Whether to save the built index.
+            id_key: The key of the utterance-id in the JSONL records (default: the first of `key`, `utt`, `utt_id`, `id`).
+            text_key: The key of the text in the JSONL records (default: the first of `text`, `txt`, `sentence`).
+        """
+        if fmt is None:
+            fmt = "jsonl" if path.endswith((".jsonl", ".json")) else "scp"
+        if fmt not in ("scp", "jsonl"):
+            raise ValueError(f"Unsupported format: {fmt}")
+        self.path = path
+        self.fmt = fmt
+        self.id_key = id_key
+        self.text_key = text_key
+        self.file = open(path, "rb")
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) > 0 else b""
+
+        index_path = index_path or path + ".idx"
+        stat = os.fstat(self.file.fileno())
+        # Identifies the indexed content of the file, the modification time alone misses the quick rewrites.
+        signature = [stat.st_size, stat.st_mtime_ns]
+        self.index = self.read_index(index_path, signature)
+        if self.index is None:
+            self.index = self.build_index()
+            if save_index:
+                self.write_index(index_path, signature)
+
+    @staticmethod
+    def read_index(index_path: str, signature: List[int]) -> Optional[np.ndarray]:
+        """
+        Load a saved index.
+
+        Args:
+            index_path: The path to the index.
+            signature: The size and modification time (in nanoseconds) of the file.
+        Returns:
+            The index, or None if it is missing, invalid or built from another version of the file.
+        """
+        if not os.path.exists(index_path):
+            return None
+        try:
+            data = np.load(index_path)
+            # The indexes saved without the signature are plain arrays.
+            if not isinstance(data, np.lib.npyio.NpzFile):
+                return None
+            with data:
+                if not {"index", "signature"} <= set(data.files) or data["signature"].tolist() != signature:
+                    return None
+                return data["index"]
+        except (OSError, ValueError, EOFError, zipfile.BadZipFile):
+            return None
+
+    def write_index(self, index_path: str, signature: List[int]):
+        """
+        Save the index with the signature of the file, or keep it in memory only if it cannot be saved.
+
+        Args:
+            index_path: The path to the index.
+            signature: The size and modification time (in nanoseconds) of the file.
+        """
+        # Written aside and renamed, so a concurrent reader never loads a partial index.
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        try:
+            with open(temp_path, "wb") as fout:
+                np.savez(fout, index=self.index, signature=np.array(signature, dtype=np.int64))
+            os.replace(temp_path, index_path)
+        except OSError as e:
+            logging.warning("Cannot save the index of %s, keep it in memory: %s", self.path, e)
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def build_index(self) -> np.ndarray:
+        """
+        Index the utterances by utterance-id.
+
+        Returns:
+            The structured array of the utterance-ids and the byte spans of the texts, sorted by utterance-id.
+        """
+        if self.fmt == "jsonl":
+            ids, starts, ends = self.scan_jsonl()
+        else:
+            ids, starts, ends = self.scan_scp()
+        width = max(1, ids.dtype.itemsize)
+        index = np.empty(len(ids), dtype=[("id", f"S{width}"), ("start", "<i8"), ("end", "<i8")])
+        index["id"], index["start"], index["end"] = ids, starts, ends
+        index = index[np.argsort(index["id"], kind="stable")]
+
+        # Keep the first of the repeated utterances, whose texts must be the same.
+        repeated = np.flatnonzero(index["id"][1:] == index["id"][:-1]) + 1
+        for position in repeated:
+            text, first = self.decode(index[position]), self.decode(index[position - 1])
+            if text != first:
+                utt = index["id"][position].decode("utf-8")
+                raise ValueError(f"Conflicting text found:\n{utt}\t{text}\n{utt}\t{first}")
+        return np.delete(index, repeated)
+
+    def scan_scp(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the utterance-ids and the text spans of the scp lines, in chunks of whole lines.
+
+        Returns:
+            The utterance-ids, and the start and end offsets of the texts.
+        """
+        chunks = []
+        start = 0
+        while start < len(self.data):
+            end = self.data.find(b"\n", start + CHUNK_SIZE)
+            end = len(self.data) if end < 0 else end + 1
+            chunks.append(self.scan_scp_chunk(start, end))
+            start = end
+        if not chunks:
+            return np.array([], dtype="S1"), np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        return tuple(np.concatenate(columns) for columns in zip(*chunks))
+
+    def scan_scp_chunk(self, offset: int, end: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the utterance-ids and the text spans of the scp lines in a chunk, vectorized over its bytes.
+
+        Args:
+            offset: The start offset of the chunk, at the start of a line.
+            end: The end offset of the chunk, at the end of a line.
+        Returns:
+            The utterance-ids, and the start and end offsets of the texts.
+        """
+        data = np.frombuffer(self.data, dtype=np.uint8, count=end - offset, offset=offset)
+        delimiters = np.frombuffer(DELIMITERS, dtype=np.uint8)
+        newlines = np.flatnonzero(data == ord("\n"))
+        starts = np.concatenate([[0], newlines + 1])
+        ends = np.concatenate([newlines, [len(data)]])
+        # The positions of the delimiters, with the end of the chunk as the sentinel.
+        positions = np.append(np.flatnonzero(np.isin(data, delimiters)), len(data))
+        # The lines starting with a delimiter are blank or indented, the rare indented ones are scanned one by one.
+        nonempty = starts < ends
+        indented = nonempty.copy()
+        indented[nonempty] = np.isin(data[starts[nonempty]], delimiters)
+        plain = nonempty & ~indented
+        id_starts = starts[plain]
+        id_ends = np.minimum(positions[np.searchsorted(positions, id_starts)], ends[plain])
+
+        ids, text_starts, text_ends = [], [], []
+        for start, end in zip(starts[indented], ends[indented]):
+            line = data[start:end].tobytes()
+            stripped = line.lstrip(DELIMITERS)
+            if stripped:
+                utt = stripped.split(maxsplit=1)[0]
+                ids.append(utt)
+                text_starts.append(start + len(line) - len(stripped) + len(utt))
+                text_ends.append(end)
+
+        # Gather the utterance-ids into a fixed width bytes array, padded with zeros.
+        lengths = id_ends - id_starts
+        width = max([1, int(lengths.max(initial=0))] + [len(utt) for utt in ids])
+        padded = np.zeros((len(id_starts), width), dtype=np.uint8)
+        for column in range(width):
+            valid = lengths > column
+            padded[valid, column] = data[id_starts[valid] + column]
+        del data
+        return (
+            np.concatenate([padded.view(f"S{width}").ravel(), np.array(ids, dtype=f"S{width}")]),
+            np.concatenate([id_ends, np.array(text_starts, dtype=np.int64)]) + offset,
+            np.concatenate([ends[plain], np.array(text_ends, dtype=np.int64)]) + offset,
+        )
+
+    def scan_jsonl(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Find the utterance-ids and the line spans of the JSONL records.
+
+        Returns:
+            The utterance-ids, and the start and end offsets of the records.
+        """
+        ids, starts, ends = [], [], []
+        start = 0
+        while start < len(self.data):
+            end = self.data.find(b"\n", start)
+            end = len(self.data) if end < 0 else end
+            line = self.data[start:end].strip()
+            if line:
+                ids.append(self.record_id(json.loads(line)).encode("utf-8"))
+                starts.append(start)
+                ends.append(end)
+            start = end + 1
+        return np.array(ids, dtype=bytes), np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+    def record_id(self, record: dict) -> str:
+        key = self.id_key or next((key for key in ID_KEYS if key in record), None)
+        if key is None:
+            raise KeyError(f"No utterance-id found in {record}")
+        return str(record[key])
+
+    def decode(self, entry) -> str:
+        """
+        Decode the text of an index entry.
+
+        Args:
+            entry: The entry of the index.
+        Returns:
+            The text.
+        """
+        text = self.data[entry["start"] : entry["end"]].decode("utf-8")
+        if self.fmt == "scp":
+            return text.strip()
+        record = json.loads(text)
+        key = self.text_key or next((key for key in TEXT_KEYS if key in record), None)
+        if key is None:
+            raise KeyError(f"No text found in {record}")
+        return record[key]
+
+    def find(self, utts: Sequence[str]) -> np.ndarray:
+        """
+        Find the utterances in the index.
+
+        Args:
+            utts: The utterance-ids.
+        Returns:
+            The positions of the utterances in the index, -1 for the missing ones.
+        """
+        ids = self.index["id"]
+        keys = np.array([utt.encode("utf-8") for utt in utts], dtype=bytes)
+        if len(ids) == 0 or len(keys) == 0:
+            return np.full(len(keys), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(ids, keys), len(ids) - 1)
+        return np.where(ids[positions] == keys, positions, -1)
+
+    def contains(self, utts: Sequence[str]) -> List[bool]:
+        """
+        Check whether the utterances are in the file.
+
+        Args:
+            utts: The utterance-ids.
+        Returns:
+            Whether each utterance is in the file.
+        """
+        return (self.find(utts) >= 0).tolist()
+
+    def texts(self, utts: Sequence[str], default: Optional[str] = None) -> List[Optional[str]]:
+        """
+        Look up and decode the texts of the utterances.
+
+        Args:
+            utts: The utterance-ids.
+            default: The text of the missing utterances.
+        Returns:
+            The texts of the utterances.
+        """
+        return [self.decode(self.index[position]) if position >= 0 else default for position in self.find(utts)]
+
+    def __getitem__(self, utt: str) -> str:
+        position = self.find([utt])[0]
+        if position < 0:
+            raise KeyError(utt)
+        return self.decode(self.index[position])
+
+    def __contains__(self, utt: object) -> bool:
+        return isinstance(utt, str) and self.find([utt])[0] >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the utterance-ids, sorted by their UTF-8 bytes."""
+        return (utt.decode("utf-8") for utt in self.index["id"])
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def __enter__(self) -> "ScpReader":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,308 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import re
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from compute_wer.utils import is_character_based, shared_instance, shared_key
+
+# The prefix of the regex rules in the rules files.
+REGEX_PREFIX = "re:"
+# The global inline flags at the start of a regex rule, e.g., `(?i)`.
+GLOBAL_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+# The names of the alternatives of the single regex.
+RESERVED_NAME = re.compile(r"literal|r\d+")
+
+
+class RewriteRules:
+    """
+    The text rewrite rules (e.g., numbers to words, spelling variants and filler removal) applied before tokenization.
+
+    All the rules are compiled once into a single regex, so a text is rewritten in one pass whatever the number
+    of rules. The literal rules share a single alternative, longest first, and the matched literal is looked up
+    in a dict, the literals starting or ending with a letter or number only match whole words (except for the
+    character-based scripts). Each regex rule is a named alternative, tried after the literals in the order of
+    the rules, and its replacement may refer to its groups (e.g., `\\1`). The rewritten text is not rewritten
+    again, and the number of hits of each rule is counted in `hits`.
+
+    The leading global flags of a regex rule (e.g., `(?i)`) are scoped to the rule. The regex rules which cannot
+    share the single regex, i.e., with numbered backreferences (e.g., `(\\w)\\1`), conditional groups or group
+    names used by another rule, are applied in their own pass after it, in the order of the rules.
+    """
+
+    def __init__(self, rules: Iterable[Tuple[str, str, bool]] = (), case_sensitive: bool = False):
+        """
+        Create the rules.
+
+        Args:
+            rules: The (pattern, replacement, regex) of each rule.
+            case_sensitive: Whether to match the rules case sensitively.
+        """
+        self.rules = []
+        self.case_sensitive = case_sensitive
+        # The number of hits of each rule, by index.
+        self.hits = Counter()
+        # Guards the hits, the rules may be shared by the threads of an executor.
+        self.lock = threading.Lock()
+        self.pattern = None
+        self.literals = {}
+        self.regexes = {}
+        # The (compiled regex, alternative of the single regex or None for its own pass) of each regex rule.
+        self.compiled = {}
+        # The group names of the alternatives.
+        self.names = set()
+        # The (index, compiled regex) of the rules applied in their own pass, None until compiled.
+        self.passes = None
+        self.pickle_key = shared_key()
+        for rule in rules:
+            self.add(*rule)
+
+    def __reduce__(self):
+        # Only the rules are sent to the worker processes, which compile them once and count their own hits.
+        return shared_instance, (self.pickle_key, RewriteRules, self.rules, self.case_sensitive)
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def add(self, pattern: str, replacement: str = "", regex: bool = False):
+        """
+        Add a rule.
+
+        Args:
+            pattern: The literal text or the regex to rewrite.
+            replacement: The replacement, empty to remove the matches (e.g., the fillers).
+            regex: Whether the pattern is a regex.
+        """
+        if not pattern:
+            raise ValueError("Empty rewrite rule pattern.")
+        if regex:
+            # Fail on the invalid regexes and replacements when they are added, not when the rules are first applied.
+            try:
+                compiled = re.compile(pattern, 0 if self.case_sensitive else re.IGNORECASE)
+                self.check_replacement(compiled, replacement)
+            except (re.error, IndexError) as e:
+                raise ValueError(f"Invalid regex rule {pattern}: {e}") from None
+            self.compiled[len(self.rules)] = compiled, self.alternative(pattern, compiled)
+        self.rules.append((pattern, replacement, regex))
+        self.passes = None
+        self.pickle_key = shared_key()
+
+    @staticmethod
+    def check_replacement(compiled: re.Pattern, replacement: str):
+        """Check that the replacement of a regex rule only refers to the groups of the rule."""
+        # Expanded against the empty match of a regex with the same groups, the unknown groups raise an error.
+        names = {number: name for name, number in compiled.groupindex.items()}
+        groups = (f"(?P<{names[number]}>)" if number in names else "()" for number in range(1, compiled.groups + 1))
+        re.compile("".join(groups)).match("").expand(replacement)
+
+    def alternative(self, pattern: str, compiled: re.Pattern) -> Optional[str]:
+        """
+        Get the alternative of a regex rule in the single regex.
+
+        Args:
+            pattern: The regex of the rule.
+            compiled: The compiled regex.
+        Returns:
+            The regex with its leading global flags scoped to it, or None if it must be applied in its own pass.
+        """
+        if self.references_groups(pattern):
+            # The groups are renumbered within the single regex.
+            return None
+        if any(name in self.names or RESERVED_NAME.fullmatch(name) for name in compiled.groupindex):
+            return None
+        flags = ""
+        match = GLOBAL_FLAGS.match(pattern)
+        while match is not None:
+            flags += match.group(1)
+            pattern = pattern[match.end() :]
+            match = GLOBAL_FLAGS.match(pattern)
+        if flags:
+            pattern = f"(?{flags}:{pattern})"
+        try:
+            re.compile(f"(?P<r0>{pattern})", 0 if self.case_sensitive else re.IGNORECASE)
+        except re.error:
+            return None
+        self.names.update(compiled.groupindex)
+        return pattern
+
+    @staticmethod
+    def references_groups(pattern: str) -> bool:
+        """Whether a regex refers to its groups by number, i.e., with a backreference or a conditional group."""
+        i, in_class = 0, False
+        while i < len(pattern):
+            char = pattern[i]
+            if char == "\\":
+                if not in_class and pattern[i + 1 : i + 2].isdigit() and pattern[i + 1] != "0":
+                    return True
+                i += 2
+                continue
+            if in_class:
+                in_class = char != "]"
+            elif char == "[":
+                in_class = True
+                # The `]` right after `[` or `[^` is a literal.
+                i += 1
+                i += pattern.startswith("^", i)
+                i += pattern.startswith("]", i)
+                continue
+            elif pattern.startswith("(?(", i):
+                return True
+            i += 1
+        return False
+
+    @staticmethod
+    def load(path: str, case_sensitive: bool = False) -> "RewriteRules":
+        """
+        Load the rules of a file, one `PATTERN<TAB>REPLACEMENT` rule per line.
+
+        The patterns prefixed by `re:` are regexes, the others are literal texts. A missing replacement removes
+        the matches, the empty lines and the lines starting with `#` are skipped.
+
+        Args:
+            path: The path to the rules file.
+            case_sensitive: Whether to match the rules case sensitively.
+        Returns:
+            The rules.
+        """
+        rules = RewriteRules(case_sensitive=case_sensitive)
+        with open(path, encoding="utf-8") as fin:
+            for line_number, line in enumerate(fin, 1):
+                line = line.rstrip("\r\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                pattern, _, replacement = line.partition("\t")
+                regex = pattern.startswith(REGEX_PREFIX)
+                if regex:
+                    pattern = pattern[len(REGEX_PREFIX) :]
+                try:
+                    rules.add(pattern, replacement, regex)
+                except (re.error, ValueError) as e:
+                    raise ValueError(f"Invalid rule on line {line_number} of {path}: {e}")
+        return rules
+
+    def key(self, text: str) -> str:
+        return text if self.case_sensitive else text.casefold()
+
+    @staticmethod
+    def literal(text: str) -> str:
+        """Get the regex of a literal rule, matching whole words unless it starts or ends within a word."""
+        pattern = re.escape(text)
+        if re.match(r"\w", text[0]) and not is_character_based(text[0]):
+            pattern = r"(?<!\w)" + pattern
+        if re.match(r"\w", text[-1]) and not is_character_based(text[-1]):
+            pattern += r"(?!\w)"
+        return pattern
+
+    def compile(self):
+        """Compile the rules into the single regex, and the rules applied in their own pass."""
+        flags = 0 if self.case_sensitive else re.IGNORECASE
+        literals, regexes = {}, {}
+        alternatives, passes = [], []
+        for index, (pattern, _, regex) in enumerate(self.rules):
+            if regex:
+                compiled, alternative = self.compiled[index]
+                if alternative is None:
+                    passes.append((index, compiled))
+                    continue
+                alternatives.append(f"(?P<r{index}>{alternative})")
+                regexes[f"r{index}"] = index, compiled
+            else:
+                # The first of the repeated literals wins.
+                literals.setdefault(self.key(pattern), index)
+        if literals:
+            order = sorted(literals.values(), key=lambda index: -len(self.rules[index][0]))
+            alternatives.insert(0, "(?P<literal>" + "|".join(self.literal(self.rules[i][0]) for i in order) + ")")
+        # The passes are set last, the rules may be applied by another thread meanwhile.
+        self.literals, self.regexes = literals, regexes
+        self.pattern = re.compile("|".join(alternatives), flags) if alternatives else None
+        self.passes = passes
+
+    def replace(self, match: re.Match, hits: List[int]) -> str:
+        name = match.lastgroup
+        if name == "literal":
+            index = self.literals.get(self.key(match.group(name)))
+            if index is None:
+                return match.group(0)
+            hits.append(index)
+            return self.rules[index][1]
+        index, regex = self.regexes[name]
+        # The groups of the rule are numbered within the rule, so it is matched again on its own to expand them.
+        own = regex.match(match.string, match.start())
+        if own is None:
+            return match.group(0)
+        hits.append(index)
+        return own.expand(self.rules[index][1])
+
+    def apply(self, text: str) -> str:
+        """
+        Rewrite a text with the rules, in a single pass (see `RewriteRules` for the rules in their own pass).
+
+        Args:
+            text: The input text.
+        Returns:
+            The rewritten text.
+        """
+        if not self.rules:
+            return text
+        if self.passes is None:
+            self.compile()
+        hits = []
+        if self.pattern is not None:
+            text = self.pattern.sub(lambda match: self.replace(match, hits), text)
+        for index, regex in self.passes:
+            replacement = self.rules[index][1]
+            text = regex.sub(lambda match: hits.append(index) or match.expand(replacement), text)
+        if hits:
+            with self.lock:
+                self.hits.update(hits)
+        return text
+
+    def pop_hits(self) -> Dict[int, int]:
+        """
+        Get and reset the hits, e.g., counted by a worker process since its last task.
+
+        Returns:
+            The number of hits of each rule, by index.
+        """
+        with self.lock:
+            hits, self.hits = self.hits, Counter()
+        return dict(hits)
+
+    def merge_hits(self, hits: Dict[int, int]):
+        """
+        Add the hits counted elsewhere, e.g., by a worker process.
+
+        Args:
+            hits: The number of hits of each rule, by index.
+        """
+        if hits:
+            with self.lock:
+                self.hits.update(hits)
+
+    def report(self, k: Optional[int] = None) -> List[Tuple[str, int]]:
+        """
+        Get the rules with the most hits.
+
+        Args:
+            k: The number of the rules (None for all).
+        Returns:
+            The list of (rule, hits) by descending hits, the rule being `PATTERN -> REPLACEMENT`.
+        """
+        report = []
+        for index, count in self.hits.most_common(k):
+            pattern, replacement, regex = self.rules[index]
+            report.append((f"{REGEX_PREFIX if regex else ''}{pattern} -> {replacement}", count))
+        return report
@@ -13,11 +13,21 @@
 # limitations under the License.
 
 import codecs
+import itertools
+import os
+import re
+import threading
 import unicodedata
-from typing import Dict, List
+from array import array
+from collections import OrderedDict
+from functools import lru_cache, partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 from unicodedata import category
 
-from compute_wer.wer import WER
+from compute_wer.wer import DEFAULT_ENGINE, WER, Engine
+
+if TYPE_CHECKING:
+    from compute_wer.rules import RewriteRules
 
 spacelist = [" ", "\t", "\r", "\n"]
 single_quote = "'"
@@ -56,62 +66,70 @@ def is_character_based(char):
     return False
 
 
-def tokenize(text, to_char=False, ignore_punctuation=True):
-    res = []
-    i = 0
-    length = len(text)
+class CharClasses(dict):
+    """
+    The lookup table of the tokenizer class of each code point, filled on first use.
 
-    while i < length:
-        char = text[i]
+    Z: whitespace or unassigned, Q: single quote, P: punctuation or symbol,
+    C: character-based script, L: letter or number, O: other.
+    """
+
+    def __missing__(self, cp: int) -> str:
+        char = chr(cp)
         cat = category(char)
-        # 1. Skip whitespace or unassigned characters
         if cat in {"Zs", "Cn"}:
-            i += 1
-            continue
-        # 2. Handle Punctuation
-        if is_punctuation(char):
-            if not ignore_punctuation:
-                res.append(char)
-                i += 1
-                continue
-            elif char == single_quote:
-                # Keep it for potential word-internal use (e.g., "it's")
-                pass
-            else:
-                i += 1
-                continue
-        # 3. Handle Character-based scripts (CN, JP, TH, etc.)
-        if is_character_based(char):
-            res.append(char)
-            i += 1
-        # 4. Handle Alphabetic/Syllabic scripts (EN, KR, RU, etc.)
+            cls = "Z"
+        elif char == single_quote:
+            cls = "Q"
+        elif is_punctuation(char):
+            cls = "P"
+        elif is_character_based(char):
+            cls = "C"
         elif cat.startswith(("L", "N")):
-            if to_char:
-                # If to_char is True, treat every letter as a separate token (CER mode)
-                res.append(char)
-                i += 1
-            else:
-                # If to_char is False, group letters into a word (WER mode)
-                j = i + 1
-                while j < length:
-                    next_char = text[j]
-                    next_cat = category(next_char)
-                    # Break if we hit a boundary
-                    if next_cat == "Zs" or is_character_based(next_char):
-                        break
-                    if is_punctuation(next_char) and next_char != single_quote:
-                        break
-                    # Continue grouping if it's a Letter/Number or internal quote
-                    if next_cat.startswith(("L", "N")) or next_char == single_quote:
-                        j += 1
-                    else:
-                        break
-                res.append(text[i:j])
-                i = j
+            cls = "L"
         else:
-            # Skip other types of characters
-            i += 1
-    return res
+            cls = "O"
+        self[cp] = cls
+        return cls
+
+
+class CharFilter(dict):
+    """The translation table deleting the characters not in the kept classes, filled on first use."""
+
+    def __init__(self, classes: str):
+        super().__init__()
+        self.classes = classes
+
+    def __missing__(self, cp: int) -> Optional[str]:
+        char = chr(cp) if char_classes[cp] in self.classes else None
+        self[cp] = char
+        return char
+
+
+char_classes = CharClasses()
+# In CER mode every kept character is a token, keyed by ignore_punctuation.
+char_filters = {False: CharFilter("LPQC"), True: CharFilter("LC")}
+# In WER mode letters are grouped into a word with the word-internal single quotes (e.g., "it's"),
+# the patterns match the tokens over the character classes, keyed by ignore_punctuation.
+word_patterns = {False: re.compile(r"L[LQ]*|[PQC]"), True: re.compile(r"L[LQ]*|C")}
+
+
+def tokenize(text, to_char=False, ignore_punctuation=True):
+    """
+    Tokenize the text into words, or characters for the character-based scripts.
+
+    Args:
+        text: The input text.
+        to_char: Whether to tokenize to character.
+        ignore_punctuation: Whether to ignore punctuation (except single quotes).
+    Returns:
+        The list of tokens.
+    """
+    if to_char:
+        return list(text.translate(char_filters[bool(ignore_punctuation)]))
+    classes = text.translate(char_classes)
+    pattern = word_patterns[bool(ignore_punctuation)]
+    return [text[match.start() : match.end()] for match in pattern.finditer(classes)]
 
 
 def char_name(char):
@@ -128,45 +146,48 @@ def char_name(char):
     return unicodedata.name(char, "UNK")
 
 
-def default_cluster(word: str) -> str:
+cluster_replacements = {
+    "DIGIT": "Number",
+    "CJK UNIFIED IDEOGRAPH": "Chinese",
+    "CJK COMPATIBILITY IDEOGRAPH": "Chinese",
+    "LATIN CAPITAL LETTER": "English",
+    "LATIN SMALL LETTER": "English",
+    "HIRAGANA LETTER": "Japanese",
+    "KATAKANA LETTER": "Japanese",
+}
+ignored_prefixes = (
+    "AMPERSAND",
+    "APOSTROPHE",
+    "COMMERCIAL AT",
+    "DEGREE CELSIUS",
+    "EQUALS SIGN",
+    "FULL STOP",
+    "HYPHEN-MINUS",
+    "LOW LINE",
+    "NUMBER SIGN",
+    "PLUS SIGN",
+    "SEMICOLON",
+    "SOH (Start of Header)",
+    "UNK (UNKOWN)",
+)
+
+
+def default_cluster(word: str, get_name: Callable[[str], str] = char_name) -> str:
     """
     Get the default cluster of a word.
 
     Args:
         word: The word to get the default cluster.
+        get_name: The function to get the name of a character.
     Returns:
         The default cluster.
     """
-    replacements = {
-        "DIGIT": "Number",
-        "CJK UNIFIED IDEOGRAPH": "Chinese",
-        "CJK COMPATIBILITY IDEOGRAPH": "Chinese",
-        "LATIN CAPITAL LETTER": "English",
-        "LATIN SMALL LETTER": "English",
-        "HIRAGANA LETTER": "Japanese",
-        "KATAKANA LETTER": "Japanese",
-    }
-    ignored_prefixes = (
-        "AMPERSAND",
-        "APOSTROPHE",
-        "COMMERCIAL AT",
-        "DEGREE CELSIUS",
-        "EQUALS SIGN",
-        "FULL STOP",
-        "HYPHEN-MINUS",
-        "LOW LINE",
-        "NUMBER SIGN",
-        "PLUS SIGN",
-        "SEMICOLON",
-        "SOH (Start of Header)",
-        "UNK (UNKOWN)",
-    )
     clusters = set()
-    for name in [char_name(char) for char in word]:
-        if any(name.startswith(prefix) for prefix in ignored_prefixes):
+    for name in [get_name(char) for char in word]:
+        if name.startswith(ignored_prefixes):
             continue
         cluster = "Other"
-        for key, value in replacements.items():
+        for key, value in cluster_replacements.items():
             if name.startswith(key):
                 cluster = value
                 break
@@ -174,27 +195,159 @@ def default_cluster(word: str) -> str:
     return clusters.pop() if len(clusters) == 1 else "Other"
 
 
-def read_scp(scp_path: str) -> Dict[str, str]:
+class LRUCache:
+    """The least recently used cache of a single-argument function, with hit and miss statistics."""
+
+    def __init__(self, func: Callable, maxsize: Optional[int] = 65536):
+        self.func = func
+        self.maxsize = maxsize
+        self.lookup = lru_cache(maxsize)(func)
+
+    def __call__(self, key):
+        return self.lookup(key)
+
+    def __reduce__(self):
+        # Only the function and the size are sent to the worker processes, not the entries.
+        return LRUCache, (self.func, self.maxsize)
+
+    def info(self) -> Dict[str, int]:
+        """
+        Get the statistics of the cache.
+
+        Returns:
+            The hits, misses, current size and maximum size of the cache.
+        """
+        info = self.lookup.cache_info()
+        return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
+
+
+# The instances unpickled in this worker process by key, with the pid of the process which built them, the least
+# recently used first.
+_shared_instances: "OrderedDict[str, Tuple[int, Any]]" = OrderedDict()
+# The maximum number of the instances kept by a worker process, the old keys of the changed options are evicted.
+MAX_SHARED_INSTANCES = 16
+_shared_keys = itertools.count()
+
+
+def shared_key() -> str:
+    """Get a new key of `shared_instance`, unique across the processes."""
+    return f"{os.getpid()}:{next(_shared_keys)}"
+
+
+def shared_instance(key: str, cls: Callable, *args) -> Any:
     """
-    Read the scp file and return a dictionary of utterance to text.
+    Get the instance unpickled in a worker process under a key, built from the arguments on first use.
+
+    The objects with expensive state (e.g., the caches of a `Normalizer` or the compiled `RewriteRules`) are
+    pickled as `shared_instance(key, cls, *args)`, so a worker process builds them once and keeps their state
+    across its tasks, instead of building them from the pickled options for each task. The main process always
+    builds a new instance, like a normal unpickling (e.g., `copy.deepcopy`).
+
+    In a worker process, all the unpickled copies of a key are the same object (e.g., two pickled copies or a
+    `copy.deepcopy`), so their state is shared. Only the `MAX_SHARED_INSTANCES` most recently used instances are
+    kept, the others are built again if their key comes back.
+
+    Args:
+        key: The key of the pickled instance, a new key (see `shared_key`) whenever its options change.
+        cls: The class of the instance.
+        args: The arguments building the instance.
+    Returns:
+        The instance.
+    """
+    from multiprocessing import parent_process
+
+    if parent_process() is None:
+        return cls(*args)
+    pid = os.getpid()
+    entry = _shared_instances.get(key)
+    # The entries inherited by a forked process belong to its parent.
+    if entry is None or entry[0] != pid:
+        entry = _shared_instances[key] = pid, cls(*args)
+        while len(_shared_instances) > MAX_SHARED_INSTANCES:
+            _shared_instances.popitem(last=False)
+    _shared_instances.move_to_end(key)
+    return entry[1]
+
+
+def iter_scp(scp_path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Iterate over the lines of the scp file.
 
     Args:
         scp_path: The path to the scp file.
     Returns:
-        The dictionary of utterance to text.
+        The iterator of (utterance, text) pairs.
     """
-    utt2text = {}
     for line in codecs.open(scp_path, encoding="utf-8"):
         arr = line.strip().split(maxsplit=1)
         if len(arr) == 0:
             continue
-        utt, text = arr[0], arr[1] if len(arr) > 1 else ""
+        yield arr[0], arr[1] if len(arr) > 1 else ""
+
+
+def read_scp(scp_path: str) -> Dict[str, str]:
+    """
+    Read the scp file and return a dictionary of utterance to text.
+
+    Args:
+        scp_path: The path to the scp file.
+    Returns:
+        The dictionary of utterance to text.
+    """
+    utt2text = {}
+    for utt, text in iter_scp(scp_path):
         if utt in utt2text and text != utt2text[utt]:
             raise ValueError(f"Conflicting text found:\n{utt}\t{text}\n{utt}\t{utt2text[utt]}")
         utt2text[utt] = text
     return utt2text
 
 
+def iter_sorted_scp(scp_path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Iterate over the scp file sorted by utterance, dropping repeated lines.
+
+    Args:
+        scp_path: The path to the scp file, sorted by utterance (e.g. `LC_ALL=C sort`).
+    Returns:
+        The iterator of (utterance, text) pairs with unique utterances.
+    """
+    prev_utt, prev_text = None, None
+    for utt, text in iter_scp(scp_path):
+        if prev_utt is not None:
+            if utt == prev_utt:
+                if text != prev_text:
+                    raise ValueError(f"Conflicting text found:\n{utt}\t{text}\n{utt}\t{prev_text}")
+                continue
+            if utt < prev_utt:
+                raise ValueError(f"{scp_path} is not sorted: {utt} after {prev_utt}")
+        yield utt, text
+        prev_utt, prev_text = utt, text
+
+
+def merge_scp(ref_path: str, hyp_path: str) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Merge-join two sorted scp files by utterance.
+
+    Args:
+        ref_path: The path to the sorted reference scp file.
+        hyp_path: The path to the sorted hypothesis scp file.
+    Returns:
+        The iterator of (utterance, reference, hypothesis) triples, where the missing side is None.
+    """
+    refs, hyps = iter_sorted_scp(ref_path), iter_sorted_scp(hyp_path)
+    ref, hyp = next(refs, None), next(hyps, None)
+    while ref is not None or hyp is not None:
+        if hyp is None or (ref is not None and ref[0] < hyp[0]):
+            yield ref[0], ref[1], None
+            ref = next(refs, None)
+        elif ref is None or hyp[0] < ref[0]:
+            yield hyp[0], None, hyp[1]
+            hyp = next(hyps, None)
+        else:
+            yield ref[0], ref[1], hyp[1]
+            ref, hyp = next(refs, None), next(hyps, None)
+
+
 def strip_tags(token: str) -> str:
     """
     Strip the tags from the token.
@@ -222,6 +375,22 @@ def strip_tags(token: str) -> str:
     return "".join(chars)
 
 
+def normalize_token(token: str, case_sensitive: bool = False, remove_tag: bool = False) -> str:
+    """
+    Normalize a token.
+
+    Args:
+        token: The token to normalize.
+        case_sensitive: Whether to be case sensitive.
+        remove_tag: Whether to remove the tags.
+    Returns:
+        The normalized token.
+    """
+    if remove_tag:
+        token = strip_tags(token)
+    return token if case_sensitive else token.upper()
+
+
 def normalize(
     text: str,
     to_char: bool = False,
@@ -229,6 +398,8 @@ def normalize(
     remove_tag: bool = False,
     ignore_words: set = None,
     ignore_punctuation: bool = False,
+    token_normalizer: Optional[Callable[[str], str]] = None,
+    rules: Optional["RewriteRules"] = None,
 ) -> List[str]:
     """
     Normalize the input text.
@@ -240,17 +411,155 @@ def normalize(
         remove_tag: Whether to remove the tags.
         ignore_words: The words to ignore.
         ignore_punctuation: Whether to ignore punctuation (except single quotes).
+        token_normalizer: The function to normalize a token (default: `normalize_token` with the options).
+        rules: The rewrite rules applied to the text before tokenization.
     Returns:
         The list of normalized tokens.
     """
-    tokens = tokenize(text, to_char, ignore_punctuation)
-    tokens = (strip_tags(token) if remove_tag else token for token in tokens)
-    tokens = (token.upper() if not case_sensitive else token for token in tokens)
+    if rules is not None:
+        text = rules.apply(text)
+    if token_normalizer is None:
+        token_normalizer = partial(normalize_token, case_sensitive=case_sensitive, remove_tag=remove_tag)
+    tokens = map(token_normalizer, tokenize(text, to_char, ignore_punctuation))
     if ignore_words is None:
         ignore_words = set()
     return [token for token in tokens if token and token not in ignore_words]
 
 
+class Normalizer:
+    """
+    The normalization pipeline built once from the options, interning the tokens into integer ids.
+
+    Each distinct raw token is normalized (tag removal and case folding), checked against the ignored
+    words and interned only once, then a text is normalized in a single pass of cached lookups from
+    its raw tokens to the ids. The ids are shared by the references and hypotheses, so the engines
+    align integers instead of strings.
+    """
+
+    def __init__(
+        self,
+        to_char: bool = False,
+        case_sensitive: bool = False,
+        remove_tag: bool = False,
+        ignore_words: set = None,
+        ignore_punctuation: bool = False,
+        token_normalizer: Optional[Callable[[str], str]] = None,
+        cache_size: Optional[int] = 65536,
+        rules: Optional["RewriteRules"] = None,
+    ):
+        """
+        Build the pipeline.
+
+        Args:
+            to_char: Whether to tokenize to character.
+            case_sensitive: Whether to be case sensitive.
+            remove_tag: Whether to remove the tags.
+            ignore_words: The words to ignore.
+            ignore_punctuation: Whether to ignore punctuation (except single quotes).
+            token_normalizer: The function to normalize a token (default: `normalize_token` with the options).
+            cache_size: The maximum number of the cached raw tokens (None for unbounded).
+            rules: The rewrite rules applied to the texts before tokenization.
+        """
+        self.to_char = to_char
+        self.case_sensitive = case_sensitive
+        self.remove_tag = remove_tag
+        self.ignore_words = set(ignore_words or ())
+        self.ignore_punctuation = bool(ignore_punctuation)
+        self.token_normalizer = token_normalizer
+        if token_normalizer is None:
+            token_normalizer = partial(normalize_token, case_sensitive=case_sensitive, remove_tag=remove_tag)
+        self.normalize_token = token_normalizer
+        self.cache_size = cache_size
+        self.rules = rules
+        self.pickle_key = shared_key()
+        # The normalized token of each id, and the id of each normalized token.
+        self.tokens = []
+        self.vocab = {}
+        # Guards the vocabulary, the pipeline may be shared by the threads of an executor.
+        self.lock = threading.Lock()
+        # The id of each raw token, -1 for the dropped ones.
+        self.cache = LRUCache(self.intern, cache_size)
+
+    def __reduce__(self):
+        # Only the options are sent to the worker processes, which intern their own ids and keep their caches
+        # across the tasks, until the rules change.
+        options = (self.to_char, self.case_sensitive, self.remove_tag, self.ignore_words, self.ignore_punctuation)
+        key = self.pickle_key if self.rules is None else f"{self.pickle_key}/{self.rules.pickle_key}"
+        return shared_instance, (key, Normalizer, *options, self.token_normalizer, self.cache_size, self.rules)
+
+    def intern(self, raw_token: str) -> int:
+        """
+        Normalize and intern a raw token.
+
+        Args:
+            raw_token: The raw token.
+        Returns:
+            The id of the normalized token, or -1 if it is empty or ignored.
+        """
+        token = self.normalize_token(raw_token)
+        if not token or token in self.ignore_words:
+            return -1
+        with self.lock:
+            index = self.vocab.get(token)
+            if index is None:
+                index = self.vocab[token] = len(self.tokens)
+                self.tokens.append(token)
+        return index
+
+    def ids(self, text: str) -> array:
+        """
+        Normalize a text into the token ids.
+
+        Args:
+            text: The input text.
+        Returns:
+            The array of the token ids.
+        """
+        lookup = self.cache
+        if self.rules is not None:
+            text = self.rules.apply(text)
+        return array(
+            "q", [index for index in map(lookup, tokenize(text, self.to_char, self.ignore_punctuation)) if index >= 0]
+        )
+
+    def normalize_batch(self, texts: Iterable[str]) -> List[array]:
+        """
+        Normalize the texts into the token ids.
+
+        Args:
+            texts: The input texts.
+        Returns:
+            The arrays of the token ids of each text.
+        """
+        return [self.ids(text) for text in texts]
+
+    def decode(self, ids: Iterable[int]) -> List[str]:
+        """
+        Get the normalized tokens of the token ids.
+
+        Args:
+            ids: The token ids.
+        Returns:
+            The list of normalized tokens.
+        """
+        return list(map(self.tokens.__getitem__, ids))
+
+    def __call__(self, text: str) -> List[str]:
+        """
+        Normalize a text, same as `normalize` with the options.
+
+        Args:
+            text: The input text.
+        Returns:
+            The list of normalized tokens.
+        """
+        return self.decode(self.ids(text))
+
+    def info(self) -> Dict[str, int]:
+        """Get the statistics of the raw token cache, see `LRUCache.info`."""
+        return self.cache.info()
+
+
 def wer(
     reference: str,
     hypothesis: str,
@@ -259,6 +568,12 @@ def wer(
     remove_tag: bool = False,
     ignore_words: set = None,
     ignore_punctuation: bool = False,
+    engine: Union[str, Engine] = DEFAULT_ENGINE,
+    tokens: bool = True,
+    token_normalizer: Optional[Callable[[str], str]] = None,
+    max_wer: Optional[float] = None,
+    normalizer: Optional[Normalizer] = None,
+    rules: Optional["RewriteRules"] = None,
 ) -> WER:
     """
     Calculate the WER and align the reference and hypothesis.
@@ -271,9 +586,17 @@ def wer(
         remove_tag: Whether to remove the tags.
         ignore_words: The words to ignore.
         ignore_punctuation: Whether to ignore punctuation (except single quotes).
+        engine: The name of the alignment engine, or the engine (e.g., with its own options).
+        tokens: Whether to count the edit operations per token.
+        token_normalizer: The function to normalize a token (default: `normalize_token` with the options).
+        max_wer: Give up the alignment as soon as the WER must exceed it (see `WER`).
+        normalizer: The normalization pipeline, overriding the normalization options (default: built from them).
+        rules: The rewrite rules applied to the texts before tokenization.
     Returns:
         The WER of the reference and hypothesis.
     """
-    reference = normalize(reference, to_char, case_sensitive, remove_tag, ignore_words, ignore_punctuation)
-    hypothesis = normalize(hypothesis, to_char, case_sensitive, remove_tag, ignore_words, ignore_punctuation)
-    return WER(reference, hypothesis)
+    if normalizer is None:
+        options = (to_char, case_sensitive, remove_tag, ignore_words, ignore_punctuation, token_normalizer)
+        normalizer = Normalizer(*options, rules=rules)
+    ids = normalizer.ids(reference), normalizer.ids(hypothesis)
+    return WER(normalizer.decode(ids[0]), normalizer.decode(ids[1]), engine, tokens, max_wer, ids)
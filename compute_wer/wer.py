@@ -12,49 +12,958 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from collections import defaultdict
-from typing import List, Optional
+from __future__ import annotations
+
+import logging
+import math
+import sys
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict, deque
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from unicodedata import east_asian_width
 
-from edit_distance import SequenceMatcher
+if TYPE_CHECKING:
+    import numpy as np
+
+# NumPy and edit_distance are imported on first use, so the short CLI invocations start fast.
+
+# The one-character codes of the edit operations.
+CODES = {"equal": "C", "replace": "S", "delete": "D", "insert": "I"}
+OPS = {code: op for op, code in CODES.items()}
+# The column of each edit operation in the counts, i.e., (equal, replace, delete, insert).
+COLUMNS = {code: column for column, code in enumerate(CODES.values())}
+
+
+class Engine:
+    """The interface of the alignment engines."""
+
+    name = None
+    # Whether the engine always finds a minimum edit distance alignment.
+    exact = True
+    # Whether the engine can align the token ids interned by the `Normalizer` instead of the tokens.
+    interned = True
+    # The names of the counters of the engine, collected from the worker processes with `pop_stats`.
+    counters = ()
+
+    def __init__(self):
+        from compute_wer.utils import shared_key
+
+        self.pickle_key = shared_key()
+        # Guards the counters, the engine may be shared by the threads of an executor.
+        self.lock = threading.Lock()
+        for counter in self.counters:
+            setattr(self, counter, 0)
+
+    def __reduce__(self):
+        # Only the options are sent to the worker processes, which build the engine once and keep it across the tasks.
+        from compute_wer.utils import shared_instance
+
+        return shared_instance, (self.pickle_key, type(self), *self.options())
+
+    def options(self) -> tuple:
+        """Get the arguments building the same engine, e.g., in the worker processes."""
+        return ()
+
+    def pop_stats(self) -> Dict[str, Any]:
+        """
+        Get and reset the counters of the engine, e.g., collected by a worker process since its last task.
+
+        Returns:
+            The value of each counter.
+        """
+        with self.lock:
+            stats = {counter: getattr(self, counter) for counter in self.counters}
+            for counter in self.counters:
+                setattr(self, counter, 0)
+        return stats
+
+    def merge_stats(self, stats: Dict[str, Any]):
+        """
+        Add the counters collected elsewhere, e.g., by a worker process.
+
+        Args:
+            stats: The value of each counter, see `pop_stats`.
+        """
+        with self.lock:
+            for counter, value in stats.items():
+                setattr(self, counter, getattr(self, counter) + value)
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        """
+        Align the reference and hypothesis with the minimum edit distance.
+
+        Args:
+            reference: The reference tokens.
+            hypothesis: The hypothesis tokens.
+            max_distance: Give up as soon as the edit distance must exceed it (default: no limit).
+        Returns:
+            The edit operations, one code of `CODES` per aligned pair, or None if the edit distance exceeds
+            `max_distance`.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def lower_bound(reference: List[str], hypothesis: List[str]) -> int:
+        """
+        Get a lower bound of the edit distance in linear time.
+
+        Every correct pair consumes a common token, so at most `common` tokens of the longer
+        sequence are correct and all the others are edited.
+
+        Args:
+            reference: The reference tokens.
+            hypothesis: The hypothesis tokens.
+        Returns:
+            The lower bound of the edit distance.
+        """
+        common = sum((Counter(reference) & Counter(hypothesis)).values())
+        return max(len(reference), len(hypothesis)) - common
+
+    @staticmethod
+    def exceeds(ops: str, max_distance: Optional[int]) -> bool:
+        return max_distance is not None and len(ops) - ops.count("C") > max_distance
+
+
+class EditDistanceEngine(Engine):
+    """The pure Python engine backed by `edit_distance.SequenceMatcher`."""
+
+    name = "edit_distance"
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        if max_distance is not None and self.lower_bound(reference, hypothesis) > max_distance:
+            return None
+        from edit_distance import SequenceMatcher
+
+        matcher = SequenceMatcher(reference, hypothesis)
+        ops = "".join(CODES[opcode[0]] for opcode in matcher.get_opcodes())
+        return None if self.exceeds(ops, max_distance) else ops
+
+
+class NumpyEngine(Engine):
+    """
+    The engine running the Levenshtein DP over integer token ids with NumPy.
+
+    Each row of the DP is computed with vectorized operations, and the insertions within
+    a row are resolved with a cumulative minimum. The backtrace breaks ties in favor of
+    substitution, then insertion, then deletion, exactly like `edit_distance`.
+
+    With a maximum distance, the DP stops as soon as no cell of the current row can
+    still end within it (Ukkonen's cutoff), so hopeless hypotheses are not aligned.
+
+    The small DPs are computed in pure Python, which is faster than the per-row overhead
+    of NumPy and does not import it.
+    """
+
+    name = "numpy"
+    # The maximum number of DP cells computed in pure Python.
+    max_python_cells = 512
+
+    @staticmethod
+    def distances(
+        reference: np.ndarray, hypothesis: np.ndarray, max_distance: Optional[int] = None
+    ) -> Optional[np.ndarray]:
+        """
+        Compute the full edit distance matrix.
+
+        Args:
+            reference: The reference token ids.
+            hypothesis: The hypothesis token ids.
+            max_distance: Stop as soon as the edit distance must exceed it (default: no limit).
+        Returns:
+            The (len(reference) + 1) x (len(hypothesis) + 1) edit distance matrix, or None if the
+            edit distance exceeds `max_distance`.
+        """
+        import numpy as np
+
+        if len(reference) > len(hypothesis):
+            # The matrix is symmetric in its arguments, so always iterate over the shorter sequence.
+            dist = NumpyEngine.distances(hypothesis, reference, max_distance)
+            return dist.T if dist is not None else None
+        m, n = len(reference), len(hypothesis)
+        cols = np.arange(n + 1, dtype=np.int32)
+        dist = np.empty((m + 1, n + 1), dtype=np.int32)
+        dist[0] = cols
+        row = np.empty(n + 1, dtype=np.int32)
+        for i in range(1, m + 1):
+            NumpyEngine.next_row(dist[i - 1], i, reference[i - 1], hypothesis, row, dist[i])
+            if NumpyEngine.cutoff(dist[i], m - i, max_distance):
+                return None
+        return dist
+
+    @staticmethod
+    def next_row(prev: np.ndarray, i: int, token: int, hypothesis: np.ndarray, scratch: np.ndarray, out: np.ndarray):
+        """
+        Compute the row i of the DP from the row i - 1.
+
+        Args:
+            prev: The row i - 1.
+            i: The index of the row.
+            token: The reference token id of the row.
+            hypothesis: The hypothesis token ids.
+            scratch: The buffer of the same size as the rows.
+            out: The output row.
+        """
+        import numpy as np
+
+        scratch[0] = i
+        np.minimum(prev[:-1] + (hypothesis != token), prev[1:] + 1, out=scratch[1:])
+        # dist[i][j] = min_{k <= j} (row[k] + j - k)
+        cols = np.arange(len(prev), dtype=np.int32)
+        scratch -= cols
+        np.minimum.accumulate(scratch, out=out)
+        out += cols
+
+    @staticmethod
+    def cutoff(row: np.ndarray, remaining_rows: int, max_distance: Optional[int]) -> bool:
+        """Whether no cell of the row can end within the maximum distance."""
+        if max_distance is None:
+            return False
+        import numpy as np
+
+        # The cheapest way from the cell j of the row to the end is |remaining rows - remaining columns| edits.
+        remaining_cols = np.arange(len(row) - 1, -1, -1, dtype=np.int32)
+        return (row + np.abs(remaining_cols - remaining_rows)).min() > max_distance
+
+    @staticmethod
+    def distance(reference: np.ndarray, hypothesis: np.ndarray) -> int:
+        """
+        Compute the edit distance only, keeping two rows of the DP.
+
+        Args:
+            reference: The reference token ids.
+            hypothesis: The hypothesis token ids.
+        Returns:
+            The edit distance.
+        """
+        import numpy as np
+
+        if len(reference) > len(hypothesis):
+            reference, hypothesis = hypothesis, reference
+        prev = np.arange(len(hypothesis) + 1, dtype=np.int32)
+        row, scratch = np.empty_like(prev), np.empty_like(prev)
+        for i in range(1, len(reference) + 1):
+            NumpyEngine.next_row(prev, i, reference[i - 1], hypothesis, scratch, row)
+            prev, row = row, prev
+        return int(prev[-1])
+
+    @staticmethod
+    def token_ids(reference: List[str], hypothesis: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Map the tokens to the integer ids shared by the reference and hypothesis."""
+        import numpy as np
+
+        if isinstance(reference, array) and isinstance(hypothesis, array):
+            # Already interned by the `Normalizer`.
+            return np.asarray(reference, dtype=np.int64), np.asarray(hypothesis, dtype=np.int64)
+        vocab = {}
+        ref = [vocab.setdefault(token, len(vocab)) for token in reference]
+        hyp = [vocab.setdefault(token, len(vocab)) for token in hypothesis]
+        return np.array(ref, dtype=np.int64), np.array(hyp, dtype=np.int64)
+
+    @staticmethod
+    def python_distances(reference: Sequence, hypothesis: Sequence) -> List[List[int]]:
+        """
+        Compute the full edit distance matrix in pure Python, for the small DPs.
+
+        Args:
+            reference: The reference tokens.
+            hypothesis: The hypothesis tokens.
+        Returns:
+            The (len(reference) + 1) x (len(hypothesis) + 1) edit distance matrix.
+        """
+        prev = list(range(len(hypothesis) + 1))
+        dist = [prev]
+        for i, token in enumerate(reference, 1):
+            row = [i]
+            left = i
+            for j, other in enumerate(hypothesis):
+                left = min(prev[j] + (token != other), prev[j + 1] + 1, left + 1)
+                row.append(left)
+            dist.append(row)
+            prev = row
+        return dist
+
+    @staticmethod
+    def backtrace(dist: Callable[[int, int], int], ref: Sequence, hyp: Sequence) -> str:
+        """
+        Backtrace the edit operations from the bottom right cell of the DP.
+
+        Args:
+            dist: The function getting the cell (i, j) of the DP.
+            ref: The reference tokens.
+            hyp: The hypothesis tokens.
+        Returns:
+            The edit operations.
+        """
+        ops = []
+        i, j = len(ref), len(hyp)
+        while i > 0 and j > 0:
+            d = dist(i, j)
+            cost = ref[i - 1] != hyp[j - 1]
+            if dist(i - 1, j - 1) + cost == d:
+                i, j = i - 1, j - 1
+                ops.append("S" if cost else "C")
+            elif dist(i, j - 1) + 1 == d:
+                j -= 1
+                ops.append("I")
+            else:
+                i -= 1
+                ops.append("D")
+        return "I" * j + "D" * i + "".join(reversed(ops))
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        if reference == hypothesis:
+            return "C" * len(reference)
+        if max_distance is not None and self.lower_bound(reference, hypothesis) > max_distance:
+            return None
+        if len(reference) * len(hypothesis) <= self.max_python_cells:
+            dist = self.python_distances(reference, hypothesis)
+            if max_distance is not None and dist[-1][-1] > max_distance:
+                return None
+            return self.backtrace(lambda i, j: dist[i][j], reference, hypothesis)
+        ref, hyp = self.token_ids(reference, hypothesis)
+        dist = self.distances(ref, hyp, max_distance)
+        if dist is None or (max_distance is not None and dist[-1, -1] > max_distance):
+            return None
+        return self.backtrace(dist.item, ref.tolist(), hyp.tolist())
+
+
+class LinearEngine(NumpyEngine):
+    """
+    The NumPy engine in O(sqrt(m) * n) memory, for the very long sequences (e.g., long-form audio).
+
+    The forward pass only keeps every sqrt(m)-th row of the DP as a checkpoint, and the backtrace
+    recomputes the rows of one block at a time from its checkpoint. Unlike Hirschberg's algorithm,
+    it follows the same path as `numpy`, so the edit operations are exactly the same, at the cost of
+    computing the DP twice.
+    """
+
+    name = "linear"
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        if reference == hypothesis:
+            return "C" * len(reference)
+        if max_distance is not None and self.lower_bound(reference, hypothesis) > max_distance:
+            return None
+        import numpy as np
+
+        ref, hyp = self.token_ids(reference, hypothesis)
+        m, n = len(ref), len(hyp)
+        step = max(1, math.isqrt(m))
+        checkpoints = {0: np.arange(n + 1, dtype=np.int32)}
+        prev, row, scratch = checkpoints[0].copy(), np.empty(n + 1, dtype=np.int32), np.empty(n + 1, dtype=np.int32)
+        for i in range(1, m + 1):
+            self.next_row(prev, i, ref[i - 1], hyp, scratch, row)
+            if self.cutoff(row, m - i, max_distance):
+                return None
+            if i % step == 0:
+                checkpoints[i] = row.copy()
+            prev, row = row, prev
+        if max_distance is not None and prev[-1] > max_distance:
+            return None
+
+        block, block_start = None, None
+
+        def dist(i: int, j: int) -> int:
+            nonlocal block, block_start
+            if block is None or not block_start <= i < block_start + len(block):
+                # The block holding the rows i - 1 and i.
+                block_start = max(0, i - 1) // step * step
+                rows = min(step, m - block_start)
+                block = np.empty((rows + 1, n + 1), dtype=np.int32)
+                block[0] = checkpoints[block_start]
+                for k in range(1, rows + 1):
+                    self.next_row(block[k - 1], block_start + k, ref[block_start + k - 1], hyp, scratch, block[k])
+            return block.item(i - block_start, j)
+
+        return self.backtrace(dist, ref.tolist(), hyp.tolist())
+
+
+class CompareEngine(Engine):
+    """The engine running all the other engines, checking their counts and timing them."""
+
+    name = "compare"
+    counters = ("mismatches",)
+
+    def __init__(self):
+        super().__init__()
+        self.times = defaultdict(float)
+
+    def pop_stats(self) -> Dict[str, Any]:
+        stats = super().pop_stats()
+        with self.lock:
+            stats["times"], self.times = dict(self.times), defaultdict(float)
+        return stats
+
+    def merge_stats(self, stats: Dict[str, Any]):
+        stats = dict(stats)
+        times = stats.pop("times", {})
+        super().merge_stats(stats)
+        with self.lock:
+            for name, seconds in times.items():
+                self.times[name] += seconds
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        results, times = {}, {}
+        for name, engine in ENGINES.items():
+            if name != self.name and engine.exact:
+                start = time.perf_counter()
+                results[name] = get_engine(name).align(reference, hypothesis, max_distance)
+                times[name] = time.perf_counter() - start
+        counts = {name: Counter(ops) if ops is not None else None for name, ops in results.items()}
+        mismatch = any(counts[name] != counts[DEFAULT_ENGINE] for name in counts)
+        if mismatch:
+            logging.warning("Engines disagree on %s vs %s: %s", reference, hypothesis, counts)
+        self.merge_stats({"mismatches": int(mismatch), "times": times})
+        return results[DEFAULT_ENGINE]
+
+
+class LongFormEngine(Engine):
+    """
+    The engine anchoring the long sequences on the n-grams found exactly once in both of them.
+
+    The longest chain of anchors in the same order in both sequences is aligned as correct, and the
+    segments between the anchors are aligned independently (in parallel with an executor), which is
+    much faster than a single DP, but not guaranteed to find a minimum edit distance alignment. The
+    short utterances are aligned exactly with `numpy`.
+    """
+
+    name = "longform"
+    exact = False
+    # The anchored utterances, their segments, the checked utterances and the edits of the anchored
+    # alignments exceeding the exact edit distances.
+    counters = ("anchored", "segments", "checked", "deviation")
+
+    def __init__(self, ngram: int = 6, min_cells: int = 1 << 22, check: bool = False, executor=None):
+        """
+        Create the engine.
+
+        Args:
+            ngram: The length of the anchor n-grams.
+            min_cells: The minimum number of DP cells (len(ref) x len(hyp)) of an anchored utterance.
+            check: Whether to compute the exact edit distance of the anchored utterances, see `deviation`.
+            executor: The executor aligning the segments (default: align in the calling thread), the worker
+                processes align them in their own thread.
+        """
+        super().__init__()
+        self.ngram = ngram
+        self.min_cells = min_cells
+        self.check = check
+        self.executor = executor
+
+    def options(self) -> tuple:
+        return self.ngram, self.min_cells, self.check
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        if len(reference) * len(hypothesis) < self.min_cells:
+            return get_engine(NumpyEngine.name).align(reference, hypothesis, max_distance)
+        if max_distance is not None and self.lower_bound(reference, hypothesis) > max_distance:
+            return None
+        anchors = find_anchors(reference, hypothesis, self.ngram)
+        segments = []
+        i, j = 0, 0
+        for anchor_i, anchor_j, length in anchors:
+            segments.append((reference[i:anchor_i], hypothesis[j:anchor_j]))
+            i, j = anchor_i + length, anchor_j + length
+        segments.append((reference[i:], hypothesis[j:]))
+        if self.executor is not None:
+            aligned = list(self.executor.map(_align_segment, segments))
+        else:
+            aligned = [_align_segment(segment) for segment in segments]
+        ops = "".join(segment + "C" * anchor[2] for segment, anchor in zip(aligned, anchors)) + aligned[-1]
+
+        stats = {"anchored": 1, "segments": len(segments)}
+        if self.check:
+            distance = NumpyEngine.distance(*NumpyEngine.token_ids(reference, hypothesis))
+            stats.update(checked=1, deviation=len(ops) - ops.count("C") - distance)
+        self.merge_stats(stats)
+        return None if self.exceeds(ops, max_distance) else ops
+
+
+class WeightedEngine(Engine):
+    """
+    The engine minimizing a weighted edit distance, e.g., with the near-homophones or the case and width
+    variants substituted at half the cost.
+
+    The tokens are interned into ids, and the sparse cost table maps the packed (reference id, hypothesis id)
+    pairs to their costs, the empty token (id 0) standing for the missing side of the deletions and insertions.
+    The pairs missing from the table cost 1 (0 for the same tokens), or the character edit distance of the
+    tokens normalized by the longer one with `char_cost`, computed once per pair. The costs of an utterance are
+    looked up at once in the sorted table, into a (unique reference tokens x unique hypothesis tokens) matrix,
+    and each row of the DP is vectorized like `numpy`, the insertions being resolved with a cumulative minimum
+    over the prefix sums of their costs.
+
+    The costs only choose the alignment: the zero cost substitutions are counted as correct and the others as
+    usual, so the counts reported by the `Calculator` are unchanged. The total cost of the aligned utterances is
+    kept in `cost`, and the weighted WER in `wer`.
+    """
+
+    name = "weighted"
+    exact = False
+    # The costs are looked up by token, the ids of the `Normalizer` are not shared with the cost table.
+    interned = False
+    # The tolerance of the floating point costs in the backtrace.
+    epsilon = 1e-9
+    # The aligned utterances (not filtered by the maximum distance), their reference tokens and total cost.
+    counters = ("aligned", "ref_tokens", "cost")
+
+    def __init__(self, costs: Optional[Dict[Tuple[str, str], float]] = None, char_cost: bool = False):
+        """
+        Create the engine.
+
+        Args:
+            costs: The cost of each (reference token, hypothesis token) pair, the empty token for the missing side
+                of the deletions and insertions.
+            char_cost: Whether to cost the substitutions missing from the table by the character edit distance.
+        """
+        super().__init__()
+        self.vocab = {"": 0}
+        self.tokens = [""]
+        self.costs = {}
+        self.char_cost = char_cost
+        # The character edit distance costs computed so far, by packed pair.
+        self.char_costs = {}
+        self._table = None
+        for (ref, hyp), cost in (costs or {}).items():
+            self.set_cost(ref, hyp, cost)
+
+    @property
+    def wer(self) -> float:
+        """The weighted WER, i.e., the total cost of the aligned utterances over their reference tokens."""
+        return self.cost / self.ref_tokens if self.ref_tokens > 0 else 0.0
+
+    def options(self) -> tuple:
+        costs = {}
+        for key, cost in self.costs.items():
+            costs[self.tokens[key >> 32], self.tokens[key & 0xFFFFFFFF]] = cost
+        return costs, self.char_cost
+
+    def index(self, token: str) -> int:
+        index = self.vocab.get(token)
+        if index is None:
+            index = self.vocab[token] = len(self.tokens)
+            self.tokens.append(token)
+        return index
+
+    def set_cost(self, ref: str, hyp: str, cost: float):
+        """
+        Set the cost of a pair of tokens.
+
+        Args:
+            ref: The reference token, empty for an insertion.
+            hyp: The hypothesis token, empty for a deletion.
+            cost: The cost of the substitution, deletion or insertion.
+        """
+        from compute_wer.utils import shared_key
+
+        if cost < 0:
+            raise ValueError(f"Negative cost of {ref} -> {hyp}: {cost}")
+        with self.lock:
+            self.costs[self.index(ref) << 32 | self.index(hyp)] = float(cost)
+            self._table = None
+            self.pickle_key = shared_key()
+
+    def load(self, path: str, normalize_token: Optional[Callable[[str], str]] = None):
+        """
+        Load the costs of a `REF HYP COST` file, `*` standing for the missing token of a deletion or insertion.
+
+        Args:
+            path: The path to the cost file.
+            normalize_token: The function normalizing the tokens like the texts (e.g., case folding).
+        """
+        with open(path, encoding="utf-8") as fin:
+            for line_number, line in enumerate(fin, 1):
+                fields = line.split()
+                if not fields or fields[0].startswith("#"):
+                    continue
+                if len(fields) != 3:
+                    raise ValueError(f"Invalid line {line_number} of {path}: {line.strip()}")
+                ref, hyp = ("" if token == "*" else token for token in fields[:2])
+                if normalize_token is not None:
+                    ref, hyp = normalize_token(ref), normalize_token(hyp)
+                self.set_cost(ref, hyp, float(fields[2]))
+
+    def lookup(self, keys: np.ndarray, default: np.ndarray) -> np.ndarray:
+        """
+        Look up the costs of the packed pairs in the sorted cost table.
+
+        Args:
+            keys: The packed (reference id, hypothesis id) pairs.
+            default: The costs of the pairs missing from the table.
+        Returns:
+            The costs of the pairs.
+        """
+        import numpy as np
+
+        if self._table is None:
+            table_keys = np.fromiter(self.costs.keys(), dtype=np.int64, count=len(self.costs))
+            order = np.argsort(table_keys)
+            table_costs = np.fromiter(self.costs.values(), dtype=np.float64, count=len(self.costs))
+            self._table = table_keys[order], table_costs[order]
+        table_keys, table_costs = self._table
+        if len(table_keys) == 0:
+            return default
+        positions = np.minimum(np.searchsorted(table_keys, keys), len(table_keys) - 1)
+        return np.where(table_keys[positions] == keys, table_costs[positions], default)
+
+    def substitution_costs(self, ref_ids: np.ndarray, hyp_ids: np.ndarray) -> np.ndarray:
+        """
+        Get the substitution cost matrix of the unique reference and hypothesis tokens of an utterance.
+
+        Args:
+            ref_ids: The unique reference token ids.
+            hyp_ids: The unique hypothesis token ids.
+        Returns:
+            The len(ref_ids) x len(hyp_ids) cost matrix.
+        """
+        import numpy as np
+
+        keys = ref_ids[:, None] << 32 | hyp_ids[None, :]
+        same = ref_ids[:, None] == hyp_ids[None, :]
+        default = (~same).astype(np.float64)
+        if self.char_cost:
+            for i, j in zip(*np.nonzero(~same)):
+                key = int(keys[i, j])
+                cost = self.char_costs.get(key)
+                if cost is None:
+                    ref, hyp = self.tokens[ref_ids[i]], self.tokens[hyp_ids[j]]
+                    distance = NumpyEngine.python_distances(ref, hyp)[-1][-1]
+                    cost = self.char_costs[key] = distance / max(len(ref), len(hyp))
+                default[i, j] = cost
+        costs = self.lookup(keys, default)
+        costs[same] = 0
+        return costs
+
+    def align(self, reference: List[str], hypothesis: List[str], max_distance: Optional[int] = None) -> Optional[str]:
+        if reference == hypothesis:
+            self.merge_stats({"aligned": 1, "ref_tokens": len(reference)})
+            return "C" * len(reference)
+        import numpy as np
+
+        with self.lock:
+            ref = np.array([self.index(token) for token in reference], dtype=np.int64)
+            hyp = np.array([self.index(token) for token in hypothesis], dtype=np.int64)
+        ref_ids, ref_local = np.unique(ref, return_inverse=True)
+        hyp_ids, hyp_local = np.unique(hyp, return_inverse=True)
+        subs = self.substitution_costs(ref_ids, hyp_ids)
+        deletions = self.lookup(ref_ids << 32, np.ones(len(ref_ids)))[ref_local]
+        insertions = self.lookup(hyp_ids, np.ones(len(hyp_ids)))[hyp_local]
+
+        m, n = len(ref), len(hyp)
+        # The cost of inserting the first j hypothesis tokens.
+        cols = np.concatenate([[0.0], np.cumsum(insertions)])
+        dist = np.empty((m + 1, n + 1))
+        dist[0] = cols
+        scratch = np.empty(n + 1)
+        # The substitution costs of each unique reference token along the hypothesis, gathered once.
+        rows = subs[:, hyp_local]
+        for i in range(1, m + 1):
+            scratch[0] = dist[i - 1, 0] + deletions[i - 1]
+            np.minimum(dist[i - 1, :-1] + rows[ref_local[i - 1]], dist[i - 1, 1:] + deletions[i - 1], out=scratch[1:])
+            # dist[i][j] = min_{k <= j} (row[k] + cols[j] - cols[k])
+            scratch -= cols
+            np.minimum.accumulate(scratch, out=dist[i])
+            dist[i] += cols
+
+        ops = []
+        i, j = m, n
+        ref_local, hyp_local = ref_local.tolist(), hyp_local.tolist()
+        while i > 0 and j > 0:
+            d = dist.item(i, j)
+            cost = subs.item(ref_local[i - 1], hyp_local[j - 1])
+            if abs(dist.item(i - 1, j - 1) + cost - d) <= self.epsilon:
+                i, j = i - 1, j - 1
+                ops.append("S" if cost > 0 else "C")
+            elif abs(dist.item(i, j - 1) + insertions.item(j - 1) - d) <= self.epsilon:
+                j -= 1
+                ops.append("I")
+            else:
+                i -= 1
+                ops.append("D")
+        ops = "I" * j + "D" * i + "".join(reversed(ops))
+
+        # The maximum distance bounds the counted edits, not the weighted cost, so it is only checked at the end.
+        if self.exceeds(ops, max_distance):
+            return None
+        self.merge_stats({"aligned": 1, "ref_tokens": m, "cost": dist.item(m, n)})
+        return ops
+
+
+def _align_segment(segment: Tuple[List[str], List[str]]) -> str:
+    reference, hypothesis = segment
+    # Bound the memory of the segments between the sparse anchors.
+    name = LinearEngine.name if len(reference) * len(hypothesis) > 1 << 26 else NumpyEngine.name
+    return get_engine(name).align(reference, hypothesis)
+
+
+def find_anchors(reference: List[str], hypothesis: List[str], ngram: int) -> List[Tuple[int, int, int]]:
+    """
+    Find the anchors of two sequences, i.e., the runs of the n-grams found exactly once in both of them.
+
+    Args:
+        reference: The reference tokens.
+        hypothesis: The hypothesis tokens.
+        ngram: The length of the n-grams.
+    Returns:
+        The list of (i, j, length) of the non-overlapping anchors, increasing in both i and j.
+    """
+    from bisect import bisect_left
+
+    def unique_ngrams(tokens: List[str]) -> Dict[tuple, int]:
+        positions = {}
+        for k in range(len(tokens) - ngram + 1):
+            gram = tuple(tokens[k : k + ngram])
+            positions[gram] = -1 if gram in positions else k
+        return positions
+
+    hyp_positions = unique_ngrams(hypothesis)
+    pairs = sorted((i, hyp_positions.get(gram, -1)) for gram, i in unique_ngrams(reference).items() if i >= 0)
+    pairs = [(i, j) for i, j in pairs if j >= 0]
+
+    # The longest chain increasing in j (i is already increasing), with patience sorting.
+    tails, tail_indices, parents = [], [], [-1] * len(pairs)
+    for index, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        parents[index] = tail_indices[k - 1] if k > 0 else -1
+        if k == len(tails):
+            tails.append(j)
+            tail_indices.append(index)
+        else:
+            tails[k], tail_indices[k] = j, index
+    chain = []
+    index = tail_indices[-1] if tail_indices else -1
+    while index >= 0:
+        chain.append(pairs[index])
+        index = parents[index]
+
+    # Merge the overlapping n-grams on the same diagonal into runs, and drop the other overlapping ones.
+    anchors = []
+    for i, j in reversed(chain):
+        if anchors:
+            start_i, start_j, length = anchors[-1]
+            if i - start_i == j - start_j and i <= start_i + length:
+                anchors[-1] = (start_i, start_j, i + ngram - start_i)
+                continue
+            if i < start_i + length or j < start_j + length:
+                continue
+        anchors.append((i, j, ngram))
+    return anchors
+
+
+ENGINES = {
+    engine.name: engine
+    for engine in (NumpyEngine, LinearEngine, LongFormEngine, WeightedEngine, EditDistanceEngine, CompareEngine)
+}
+DEFAULT_ENGINE = NumpyEngine.name
+_engines: Dict[str, Engine] = {}
+
+
+def get_engine(name: Union[str, Engine] = DEFAULT_ENGINE) -> Engine:
+    """
+    Get the shared instance of an alignment engine.
+
+    Args:
+        name: The name of the engine, or an engine returned as is (e.g., with its own options).
+    Returns:
+        The engine.
+    """
+    if isinstance(name, Engine):
+        return name
+    if name not in _engines:
+        if name not in ENGINES:
+            raise ValueError(f"Unknown engine: {name}, choose from {list(ENGINES)}")
+        _engines[name] = ENGINES[name]()
+    return _engines[name]
+
+
+class Alignment:
+    """
+    The alignment of the reference and hypothesis tokens.
+
+    Only the edit operations are kept, the opcodes and the padded display tokens are
+    built on first access.
+    """
+
+    def __init__(self, reference: List[str], hypothesis: List[str], ops: str):
+        self.ref = reference
+        self.hyp = hypothesis
+        self.ops = ops
+        self._display = None
+
+    @property
+    def opcodes(self) -> List[Tuple[str, int, int]]:
+        """The list of (op, i, j), where i and j index the reference and hypothesis tokens."""
+        opcodes = []
+        i, j = 0, 0
+        for code in self.ops:
+            opcodes.append((OPS[code], i, j))
+            i += code != "I"
+            j += code != "D"
+        return opcodes
+
+    def counts(self) -> Tuple[int, int, int, int]:
+        return self.ops.count("C"), self.ops.count("S"), self.ops.count("D"), self.ops.count("I")
+
+    def token_counts(self) -> Dict[str, "WER"]:
+        """
+        Count the edit operations per token, the insertions are counted on the hypothesis token.
+
+        Returns:
+            The WER of each token.
+        """
+        counts = defaultdict(lambda: [0, 0, 0, 0])
+        i, j = 0, 0
+        for code in self.ops:
+            counts[self.ref[i] if code != "I" else self.hyp[j]][COLUMNS[code]] += 1
+            i += code != "I"
+            j += code != "D"
+        tokens = defaultdict(WER)
+        for token, token_counts in counts.items():
+            tokens[token] = WER.from_counts(*token_counts)
+        return tokens
+
+    def display(self) -> Tuple[List[str], List[str]]:
+        """
+        Get the aligned reference and hypothesis tokens, padded to the same display width.
+
+        Returns:
+            The padded reference tokens.
+            The padded hypothesis tokens.
+        """
+        if self._display is None:
+            reference, hypothesis = [], []
+            for op, i, j in self.opcodes:
+                ref_token = self.ref[i] if op != "insert" else ""
+                hyp_token = self.hyp[j] if op != "delete" else ""
+                diff = WER.width(hyp_token) - WER.width(ref_token)
+                reference.append(ref_token + " " * diff)
+                hypothesis.append(hyp_token + " " * -diff)
+            self._display = reference, hypothesis
+        return self._display
 
 
 class WER:
+    __slots__ = ("equal", "replace", "delete", "insert", "alignment", "tokens", "filtered")
+
     def __init__(
         self,
         reference: Optional[List[str]] = None,
         hypothesis: Optional[List[str]] = None,
+        engine: Union[str, Engine] = DEFAULT_ENGINE,
+        tokens: bool = True,
+        max_wer: Optional[float] = None,
+        ids: Optional[Tuple[Sequence[int], Sequence[int]]] = None,
     ):
+        """
+        Align the reference and hypothesis and count the edit operations.
+
+        Args:
+            reference: The reference tokens.
+            hypothesis: The hypothesis tokens.
+            engine: The name of the alignment engine, or the engine.
+            tokens: Whether to count the edit operations per token.
+            max_wer: Give up the alignment as soon as the WER must exceed it, the WER is then filtered,
+                without counts and with an infinite `wer`.
+            ids: The interned ids of the reference and hypothesis tokens, aligned instead of the tokens
+                (see `Normalizer`).
+        """
         self.equal = 0
         self.replace = 0
         self.delete = 0
         self.insert = 0
+        self.alignment = None
+        self.filtered = False
 
         if reference is not None and hypothesis is not None:
-            self.reference = []
-            self.hypothesis = []
-            self.tokens = defaultdict(WER)
-
-            matcher = SequenceMatcher(reference, hypothesis)
-            for op, i, _, j, _ in matcher.get_opcodes():
-                setattr(self, op, getattr(self, op) + 1)
-                # For the cluster WER
-                token = reference[i] if op != "insert" else hypothesis[j]
-                if token not in self.tokens:
-                    self.tokens[token] = WER()
-                self.tokens[token][op] += 1
-
-                ref_token = reference[i] if op != "insert" else ""
-                hyp_token = hypothesis[j] if op != "delete" else ""
-                diff = WER.width(hyp_token) - WER.width(ref_token)
-                self.reference.append(ref_token + " " * diff)
-                self.hypothesis.append(hyp_token + " " * -diff)
+            aligner = get_engine(engine)
+            sequences = ids if ids is not None and aligner.interned else (reference, hypothesis)
+            ops = aligner.align(*sequences, WER.max_distance(len(reference), max_wer))
+            if ops is None:
+                self.filtered = True
+                self.tokens = defaultdict(WER)
+                return
+            self.alignment = Alignment(reference, hypothesis, ops)
+            self.equal, self.replace, self.delete, self.insert = self.alignment.counts()
+            # For the cluster WER
+            self.tokens = self.alignment.token_counts() if tokens else defaultdict(WER)
+
+    @staticmethod
+    def max_distance(ref_len: int, max_wer: Optional[float]) -> Optional[int]:
+        """
+        Get the maximum edit distance of a WER not greater than `max_wer`.
+
+        Args:
+            ref_len: The number of the reference tokens.
+            max_wer: The maximum WER.
+        Returns:
+            The maximum edit distance, or None if there is no limit.
+        """
+        # The WER of an empty reference is always 0.
+        if max_wer is None or ref_len == 0 or max_wer * ref_len >= sys.maxsize:
+            return None
+        # Round up the floating point error, aligning an utterance in vain is harmless but filtering it is not.
+        return math.floor(max_wer * ref_len + 1e-6)
+
+    @staticmethod
+    def from_filtered() -> "WER":
+        """
+        Create a WER filtered by `max_wer` before its alignment completed.
+
+        Returns:
+            The filtered WER.
+        """
+        wer = WER()
+        wer.filtered = True
+        wer.tokens = defaultdict(WER)
+        return wer
+
+    @property
+    def reference(self) -> List[str]:
+        return self.alignment.display()[0] if self.alignment is not None else []
+
+    @property
+    def hypothesis(self) -> List[str]:
+        return self.alignment.display()[1] if self.alignment is not None else []
+
+    @staticmethod
+    def from_counts(equal: int = 0, replace: int = 0, delete: int = 0, insert: int = 0) -> "WER":
+        """
+        Create a WER from the edit operation counts.
+
+        Args:
+            equal: The number of correct tokens.
+            replace: The number of substitutions.
+            delete: The number of deletions.
+            insert: The number of insertions.
+        Returns:
+            The WER.
+        """
+        wer = WER()
+        wer.equal, wer.replace, wer.delete, wer.insert = equal, replace, delete, insert
+        return wer
+
+    @staticmethod
+    def from_alignment(alignment: Alignment, tokens: bool = True) -> "WER":
+        """
+        Create a WER from an alignment.
+
+        Args:
+            alignment: The alignment of the reference and hypothesis.
+            tokens: Whether to count the edit operations per token.
+        Returns:
+            The WER.
+        """
+        wer = WER.from_counts(*alignment.counts())
+        wer.alignment = alignment
+        wer.tokens = alignment.token_counts() if tokens else defaultdict(WER)
+        return wer
 
     def __getitem__(self, key):
-        return self.__dict__[key]
+        return getattr(self, key)
 
     def __setitem__(self, key, value):
-        self.__dict__[key] = value
+        setattr(self, key, value)
 
     @staticmethod
     def width(token: str) -> int:
@@ -72,8 +981,14 @@ class WER:
     def all(self) -> int:
         return self.equal + self.replace + self.delete
 
+    @property
+    def counts(self) -> Tuple[int, int, int, int]:
+        return self.equal, self.replace, self.delete, self.insert
+
     @property
     def wer(self) -> float:
+        if self.filtered:
+            return math.inf
         if self.all == 0:
             return 0
         return (self.replace + self.delete + self.insert) / self.all
@@ -105,17 +1020,21 @@ class WER:
         """
         overall = WER()
         for wer in wers:
-            if wer is None:
-                continue
-            for key in ("equal", "replace", "delete", "insert"):
-                overall[key] += wer[key]
+            if wer is not None:
+                overall.update(wer)
         return overall
 
 
 class SER:
+    __slots__ = ("cor", "err", "ml", "mh")
+
     def __init__(self):
         self.cor = 0
         self.err = 0
+        # ML: Missing Labels(Extra Hypotheses)
+        # MH: Missing Hypotheses(Extra Labels)
+        self.ml = 0
+        self.mh = 0
 
     @property
     def all(self) -> int:
@@ -127,3 +1046,320 @@ class SER:
 
     def __str__(self) -> str:
         return f"{self.ser * 100:4.2f} % N={self.all} Cor={self.cor} Err={self.err}"
+
+    def update(self, other: "SER"):
+        """
+        Update this SER with another SER.
+
+        Args:
+            other (SER): The other SER.
+        """
+        self.cor += other.cor
+        self.err += other.err
+        self.ml += other.ml
+        self.mh += other.mh
+
+
+class SlidingWindow:
+    """The WER and SER of the last utterances, updated in constant time per utterance."""
+
+    def __init__(self, size: int = 1000):
+        """
+        Create an empty window.
+
+        Args:
+            size: The maximum number of the utterances in the window.
+        """
+        self.size = size
+        self.counts = deque()
+        self.wer = WER.from_counts()
+        self.ser = SER()
+
+    def add(self, counts: Tuple[int, int, int, int]):
+        """
+        Add the counts of an utterance, and drop the oldest utterance if the window is full.
+
+        Args:
+            counts: The (equal, replace, delete, insert) counts of the utterance.
+        """
+        self.counts.append(counts)
+        self.shift(counts, 1)
+        if len(self.counts) > self.size:
+            self.shift(self.counts.popleft(), -1)
+
+    def shift(self, counts: Tuple[int, int, int, int], sign: int):
+        equal, replace, delete, insert = counts
+        self.wer.equal += sign * equal
+        self.wer.replace += sign * replace
+        self.wer.delete += sign * delete
+        self.wer.insert += sign * insert
+        if replace + delete + insert == 0:
+            self.ser.cor += sign
+        else:
+            self.ser.err += sign
+
+
+def _column(column: int) -> property:
+    """The property of a column of the counts of a `TokenWER`, read and written in its table."""
+
+    def get(self) -> int:
+        index = self.stats.vocab.get(self.token)
+        return 0 if index is None else self.stats.counts[index * 4 + column]
+
+    def set(self, value: int):
+        self.stats.counts[self.stats.index(self.token) * 4 + column] = value
+
+    return property(get, set)
+
+
+class TokenWER(WER):
+    """
+    The WER of a token of a `TokenStats`, a view of its counts in the table.
+
+    The counts are read from and written to the table, like the WERs of the `defaultdict(WER)` it replaces,
+    so `tokens[token].update(other)` or `tokens[token]["equal"] += 1` update the statistics. An unknown
+    token is only added to the table when its counts are written.
+    """
+
+    __slots__ = ("stats", "token")
+
+    equal = _column(0)
+    replace = _column(1)
+    delete = _column(2)
+    insert = _column(3)
+
+    def __init__(self, stats: "TokenStats", token: str):
+        self.stats = stats
+        self.token = token
+        self.alignment = None
+        self.filtered = False
+
+    @property
+    def counts(self) -> Tuple[int, int, int, int]:
+        index = self.stats.vocab.get(self.token)
+        if index is None:
+            return 0, 0, 0, 0
+        return tuple(self.stats.counts[index * 4 : index * 4 + 4])
+
+    def update(self, other: WER):
+        self.stats.add(self.token, other.counts)
+
+
+class TokenStats:
+    """
+    The columnar edit operation counts of the tokens, aggregated over the utterances.
+
+    The tokens are indexed by a vocabulary, and the counts are stored in a flat int64 array with
+    the four columns (equal, replace, delete, insert) of each token, instead of a WER per token.
+    It reads like a mapping from the tokens to their WERs, the WERs are views of the counts (see `TokenWER`).
+    """
+
+    __slots__ = ("vocab", "counts")
+
+    def __init__(self):
+        self.vocab = {}
+        self.counts = array("q")
+
+    def index(self, token: str) -> int:
+        """
+        Get the index of a token, adding it to the vocabulary if needed.
+
+        Args:
+            token: The token.
+        Returns:
+            The index of the token.
+        """
+        index = self.vocab.get(token)
+        if index is None:
+            index = self.vocab[token] = len(self.vocab)
+            self.counts.extend((0, 0, 0, 0))
+        return index
+
+    def add(self, token: str, counts: Tuple[int, int, int, int]):
+        """
+        Add the edit operation counts of a token.
+
+        Args:
+            token: The token.
+            counts: The (equal, replace, delete, insert) counts.
+        """
+        offset = self.index(token) * 4
+        for column, count in enumerate(counts):
+            self.counts[offset + column] += count
+
+    def merge(self, other: "TokenStats"):
+        """
+        Merge the counts of another TokenStats.
+
+        Args:
+            other: The other TokenStats.
+        """
+        if len(other.vocab) < 256:
+            for token, index in other.vocab.items():
+                self.add(token, other.counts[index * 4 : index * 4 + 4])
+            return
+        import numpy as np
+
+        # The tokens of the other table are in the order of their indices, so its rows are added at once.
+        indices = np.fromiter((self.index(token) for token in other.vocab), dtype=np.int64, count=len(other.vocab))
+        # The view must be released before the array grows again.
+        counts = np.frombuffer(self.counts, dtype=np.int64).reshape(-1, 4)
+        counts[indices] += np.frombuffer(other.counts, dtype=np.int64).reshape(-1, 4)
+        del counts
+
+    def overall(self, tokens: Iterable[str]) -> WER:
+        """
+        Calculate the overall WER of some tokens, e.g., a cluster.
+
+        Args:
+            tokens: The tokens, the unknown tokens are skipped.
+        Returns:
+            The overall WER of the tokens.
+        """
+        indices = [self.vocab[token] for token in tokens if token in self.vocab]
+        if len(indices) < 256:
+            # Not worth importing NumPy for the few tokens, e.g., of a single utterance.
+            totals = [0, 0, 0, 0]
+            for index in indices:
+                for column in range(4):
+                    totals[column] += self.counts[index * 4 + column]
+            return WER.from_counts(*totals)
+        import numpy as np
+
+        # The view must be released before the array grows again.
+        counts = np.frombuffer(self.counts, dtype=np.int64).reshape(-1, 4)
+        totals = counts[indices].sum(axis=0).tolist()
+        del counts
+        return WER.from_counts(*totals)
+
+    def row(self, token: str) -> Tuple[int, int, int, int]:
+        index = self.vocab[token] * 4
+        return tuple(self.counts[index : index + 4])
+
+    def get(self, token: str, default: Optional[WER] = None) -> Optional[WER]:
+        return TokenWER(self, token) if token in self.vocab else default
+
+    def __getitem__(self, token: str) -> WER:
+        return TokenWER(self, token)
+
+    def __contains__(self, token: str) -> bool:
+        return token in self.vocab
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.vocab)
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def keys(self) -> Iterable[str]:
+        return self.vocab.keys()
+
+    def values(self) -> Iterator[WER]:
+        return (TokenWER(self, token) for token in self.vocab)
+
+    def items(self) -> Iterator[Tuple[str, WER]]:
+        return ((token, TokenWER(self, token)) for token in self.vocab)
+
+
+class GroupStats:
+    """
+    The edit operation and sentence counts of the utterance groups (e.g., speakers, domains or duration buckets).
+
+    The groups share a single counter table: a vocabulary of the group names and a flat int64 array with the
+    six columns (equal, replace, delete, insert, correct sentences, erroneous sentences) of each group, so an
+    utterance in any number of groups is accumulated in the same pass as the overall statistics.
+    """
+
+    __slots__ = ("vocab", "counts")
+
+    # The number of the columns of each group.
+    WIDTH = 6
+
+    def __init__(self):
+        self.vocab = {}
+        self.counts = array("q")
+
+    def index(self, name: str) -> int:
+        """
+        Get the index of a group, adding it to the vocabulary if needed.
+
+        Args:
+            name: The name of the group.
+        Returns:
+            The index of the group.
+        """
+        index = self.vocab.get(name)
+        if index is None:
+            index = self.vocab[name] = len(self.vocab)
+            self.counts.extend((0,) * self.WIDTH)
+        return index
+
+    def add(self, names: Iterable[str], counts: Tuple[int, int, int, int], correct: bool):
+        """
+        Add the edit operation counts of an utterance to its groups.
+
+        Args:
+            names: The names of the groups of the utterance.
+            counts: The (equal, replace, delete, insert) counts of the utterance.
+            correct: Whether the utterance is counted as a correct sentence.
+        """
+        row = (*counts, *((1, 0) if correct else (0, 1)))
+        for name in names:
+            offset = self.index(name) * self.WIDTH
+            for column, count in enumerate(row):
+                self.counts[offset + column] += count
+
+    def add_row(self, name: str, row: Sequence[int]):
+        """
+        Add the counts of a group, e.g., of another shard.
+
+        Args:
+            name: The name of the group.
+            row: The six counts of the group.
+        """
+        offset = self.index(name) * self.WIDTH
+        for column, count in enumerate(row):
+            self.counts[offset + column] += count
+
+    def merge(self, other: "GroupStats"):
+        """
+        Merge the counts of another GroupStats.
+
+        Args:
+            other: The other GroupStats.
+        """
+        for name in other.vocab:
+            self.add_row(name, other.row(name))
+
+    def row(self, name: str) -> Tuple[int, ...]:
+        offset = self.vocab[name] * self.WIDTH
+        return tuple(self.counts[offset : offset + self.WIDTH])
+
+    def get(self, name: str) -> Optional[Tuple[WER, SER]]:
+        """
+        Get the WER and SER of a group.
+
+        Args:
+            name: The name of the group.
+        Returns:
+            The WER and SER of the group, or None if the group is unknown.
+        """
+        if name not in self.vocab:
+            return None
+        equal, replace, delete, insert, cor, err = self.row(name)
+        ser = SER()
+        ser.cor, ser.err = cor, err
+        return WER.from_counts(equal, replace, delete, insert), ser
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.vocab
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.vocab)
+
+    def __len__(self) -> int:
+        return len(self.vocab)
+
+    def items(self) -> Iterator[Tuple[str, Tuple[WER, SER]]]:
+        """Iterate over the (name, (WER, SER)) of the groups, sorted by name."""
+        return ((name, self.get(name)) for name in sorted(self.vocab))
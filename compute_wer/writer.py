@@ -0,0 +1,196 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import sys
+from typing import Any, Dict, Optional
+
+from compute_wer.wer import WER
+
+OUTPUT_FORMATS = ("text", "jsonl", "csv", "parquet")
+COLUMNS = ("utt", "n", "cor", "sub", "del", "ins", "wer")
+# The number of rows buffered before they are written at once.
+BATCH_SIZE = 65536
+
+
+def wer_record(wer: WER) -> Dict[str, Any]:
+    """
+    Get the counts and the WER as a record.
+
+    Args:
+        wer: The WER.
+    Returns:
+        The record of the number of reference tokens, the counts and the WER.
+    """
+    return {"n": wer.all, "cor": wer.equal, "sub": wer.replace, "del": wer.delete, "ins": wer.insert, "wer": wer.wer}
+
+
+class RecordWriter:
+    """
+    The buffered writer of one row per utterance (utterance-id, counts, WER and optionally the edit operations).
+
+    The rows are buffered and written in batches, and the summary (overall, clusters and SER) is written on close.
+    """
+
+    def __init__(self, path: Optional[str] = None, ops: bool = False, batch_size: int = BATCH_SIZE):
+        """
+        Create the writer.
+
+        Args:
+            path: The path to the output file (default: stdout).
+            ops: Whether to write the edit operations (C, S, D and I per aligned token) of each utterance.
+            batch_size: The number of rows buffered before they are written.
+        """
+        self.path = path
+        self.columns = COLUMNS + ("ops",) if ops else COLUMNS
+        self.ops = ops
+        self.batch_size = batch_size
+        self.rows = []
+
+    def write(self, utt: Optional[str], wer: WER):
+        """
+        Write the row of an utterance.
+
+        Args:
+            utt: The utterance-id.
+            wer: The WER of the utterance.
+        """
+        row = (utt, wer.all, wer.equal, wer.replace, wer.delete, wer.insert, wer.wer)
+        if self.ops:
+            row += (wer.alignment.ops if wer.alignment is not None else None,)
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.rows:
+            self.write_batch(self.rows)
+            self.rows = []
+
+    def write_batch(self, rows):
+        raise NotImplementedError
+
+    def write_summary(self, summary: Dict[str, Any]):
+        """Write the summary next to the rows (`<path>.summary.json`), or log it without an output file."""
+        import json
+
+        if self.path is None:
+            logging.info("Summary: %s", json.dumps(summary, ensure_ascii=False))
+            return
+        with open(self.path + ".summary.json", "w", encoding="utf-8") as fout:
+            json.dump(summary, fout, ensure_ascii=False, indent=2)
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        """
+        Flush the rows, then write the summary and close the output.
+
+        Args:
+            summary: The summary of the overall, cluster and SER results.
+        """
+        self.flush()
+        if summary is not None:
+            self.write_summary(summary)
+
+
+class JsonlWriter(RecordWriter):
+    """Write the rows as JSON lines, followed by the summary record (`{"summary": {...}}`)."""
+
+    def __init__(self, path: Optional[str] = None, ops: bool = False, batch_size: int = BATCH_SIZE):
+        super().__init__(path, ops, batch_size)
+        self.fout = open(path, "w", encoding="utf-8") if path is not None else sys.stdout
+
+    def write_batch(self, rows):
+        import json
+
+        self.fout.write("".join(json.dumps(dict(zip(self.columns, row)), ensure_ascii=False) + "\n" for row in rows))
+
+    def write_summary(self, summary: Dict[str, Any]):
+        import json
+
+        self.fout.write(json.dumps({"summary": summary}, ensure_ascii=False) + "\n")
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        super().close(summary)
+        if self.fout is not sys.stdout:
+            self.fout.close()
+
+
+class CsvWriter(RecordWriter):
+    """Write the rows as CSV with a header, the summary is written to `<path>.summary.json`."""
+
+    def __init__(self, path: Optional[str] = None, ops: bool = False, batch_size: int = BATCH_SIZE):
+        super().__init__(path, ops, batch_size)
+        import csv
+
+        self.fout = open(path, "w", encoding="utf-8", newline="") if path is not None else sys.stdout
+        self.writer = csv.writer(self.fout)
+        self.writer.writerow(self.columns)
+
+    def write_batch(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        super().close(summary)
+        if self.fout is not sys.stdout:
+            self.fout.close()
+
+
+class ParquetWriter(RecordWriter):
+    """Write the rows as the row groups of a Parquet file, the summary is written to `<path>.summary.json`."""
+
+    def __init__(self, path: Optional[str] = None, ops: bool = False, batch_size: int = BATCH_SIZE):
+        if path is None:
+            raise ValueError("The parquet output requires an output file.")
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError(
+                "The parquet output requires pyarrow, install it with `pip install compute-wer[parquet]`."
+            )
+        super().__init__(path, ops, batch_size)
+        self.pa = pa
+        fields = [("utt", pa.string())] + [(name, pa.int64()) for name in COLUMNS[1:-1]] + [("wer", pa.float64())]
+        if ops:
+            fields.append(("ops", pa.string()))
+        self.schema = pa.schema(fields)
+        self.writer = pq.ParquetWriter(path, self.schema)
+
+    def write_batch(self, rows):
+        columns = [self.pa.array(column, type=field.type) for column, field in zip(zip(*rows), self.schema)]
+        self.writer.write_table(self.pa.Table.from_arrays(columns, schema=self.schema))
+
+    def close(self, summary: Optional[Dict[str, Any]] = None):
+        super().close(summary)
+        self.writer.close()
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter, "parquet": ParquetWriter}
+
+
+def open_writer(fmt: str, path: Optional[str] = None, ops: bool = False, batch_size: int = BATCH_SIZE) -> RecordWriter:
+    """
+    Open the writer of a machine-readable format.
+
+    Args:
+        fmt: The format, one of `jsonl`, `csv` and `parquet`.
+        path: The path to the output file (default: stdout).
+        ops: Whether to write the edit operations of each utterance.
+        batch_size: The number of rows buffered before they are written.
+    Returns:
+        The writer.
+    """
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported output format: {fmt}")
+    return WRITERS[fmt](path, ops, batch_size)
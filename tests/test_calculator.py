@@ -0,0 +1,138 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+
+from compute_wer.cache import ResultCache
+from compute_wer.calculator import Calculator
+from compute_wer.rules import RewriteRules
+from compute_wer.wer import WER, LongFormEngine, WeightedEngine
+
+ITEMS = [(str(i), f"the colour of {i}% is red", f"the color of {i} percent is read") for i in range(50)]
+
+
+def rules_calculator():
+    return Calculator(rules=RewriteRules([("colour", "color", False), (r"(\d+)%", r"\1 percent", True)]))
+
+
+def test_token_wers_write_through():
+    calculator = Calculator()
+    calculator.calculate("a b c", "a x c")
+    assert calculator.tokens["B"].counts == (0, 1, 0, 0)
+
+    calculator.tokens["B"].update(WER.from_counts(1, 2, 3, 4))
+    assert calculator.tokens["B"].counts == (1, 3, 3, 4)
+    calculator.tokens["NEW"]["equal"] += 2
+    calculator.tokens["NEW"].insert += 1
+    assert calculator.state_dict()["tokens"]["NEW"] == (2, 0, 0, 1)
+
+    # Reading an unknown token does not add it.
+    assert calculator.tokens["UNKNOWN"].all == 0
+    assert "UNKNOWN" not in calculator.tokens
+    assert calculator.tokens.get("UNKNOWN") is None
+    assert WER.overall(calculator.tokens.values()).counts == calculator.cluster(calculator.tokens).counts
+
+
+@pytest.mark.parametrize("executor", [ProcessPoolExecutor, ThreadPoolExecutor])
+def test_consume_executor(executor):
+    serial = rules_calculator()
+    expected = [(utt, str(wer)) for utt, wer in serial.consume(ITEMS)]
+    calculator = rules_calculator()
+    with executor(2) as pool:
+        assert [(utt, str(wer)) for utt, wer in calculator.consume(ITEMS, pool)] == expected
+    assert calculator.state_dict() == serial.state_dict()
+    # The hits of the rules counted in the workers are sent back with the results.
+    assert (
+        calculator.normalizer.rules.report()
+        == serial.normalizer.rules.report()
+        == [
+            ("colour -> color", len(ITEMS)),
+            ("re:(\\d+)% -> \\1 percent", len(ITEMS)),
+        ]
+    )
+
+
+def test_engine_stats_from_workers():
+    pairs = [(f"a b c d e f g h {i} i j k l m n o p", f"a b c d e f g h {i} x j k l m n o p") for i in range(20)]
+    serial = Calculator(engine=LongFormEngine(ngram=2, min_cells=1, check=True))
+    serial.calculate_batch(pairs)
+    expected = serial.engine.pop_stats()
+    assert expected["anchored"] == len(pairs) and expected["checked"] == len(pairs)
+
+    # The engine is sent to the workers with its options, and their counters are sent back with the results.
+    calculator = Calculator(engine=LongFormEngine(ngram=2, min_cells=1, check=True))
+    calculator.calculate_batch(pairs, jobs=2, chunksize=3)
+    assert calculator.engine.pop_stats() == expected
+    with ProcessPoolExecutor(2) as pool:
+        list(calculator.consume([(str(i), *pair) for i, pair in enumerate(pairs)], pool))
+    assert calculator.engine.pop_stats() == expected
+
+
+def test_result_cache_requires_exact_engine(tmp_path):
+    with pytest.raises(ValueError, match="exact engine"):
+        Calculator(engine="longform", result_cache=ResultCache(str(tmp_path)))
+
+
+def test_weighted_engine_in_workers():
+    pairs = [(f"the colour of {i}", f"a color of {i}") for i in range(20)]
+    costs = {("COLOUR", "COLOR"): 0.0, ("THE", "A"): 0.5}
+    serial = Calculator(engine=WeightedEngine(costs))
+    serial.calculate_batch(pairs)
+    assert serial.engine.wer == pytest.approx(0.5 / 4)
+
+    # The costs are sent to the workers with the engine, and the weighted counters are sent back.
+    calculator = Calculator(engine=WeightedEngine(costs))
+    calculator.calculate_batch(pairs, jobs=2, chunksize=3)
+    assert calculator.engine.pop_stats() == serial.engine.pop_stats()
+    assert calculator.state_dict() == serial.state_dict()
+
+
+def test_calculate_shared():
+    pairs = [(f"w{i} w{i + 1} w{i + 2} common", f"w{i} x{i} w{i + 2}") for i in range(400)]
+    serial = Calculator()
+    expected = serial.calculate_batch(pairs)
+    calculator = Calculator()
+    # Each worker scores its interleaved chunks and sends back a single token table, merged at once.
+    wers = calculator.calculate_batch(pairs, jobs=3, chunksize=7)
+    assert [(wer.counts, wer.alignment.ops, wer.alignment.hyp) for wer in wers] == [
+        (wer.counts, wer.alignment.ops, wer.alignment.hyp) for wer in expected
+    ]
+    assert calculator.state_dict() == serial.state_dict()
+
+
+def test_bootstrap_opt_in(tmp_path):
+    pairs = [(f"a b c {i}", f"a x c {i}") for i in range(10)]
+    calculator = Calculator()
+    calculator.calculate_batch(pairs)
+    # The utterances are only recorded for the bootstrap, so the memory and the state do not grow with them.
+    assert calculator.utt_errors is None and "utterances" not in calculator.state_dict()
+    with pytest.raises(ValueError, match="bootstrap"):
+        calculator.bootstrap(10)
+
+    recorded = Calculator(bootstrap=True)
+    recorded.calculate_batch(pairs, jobs=2)
+    assert recorded.state_dict()["utterances"] == {"errors": [1] * 10, "lengths": [4] * 10}
+    assert recorded.bootstrap(10, seed=0)["wer"] == pytest.approx(0.25)
+    with pytest.raises(ValueError, match="bootstrap"):
+        recorded.merge(calculator)
+
+    # The states saved before the option have the utterances.
+    state = recorded.state_dict()
+    del state["options"]["bootstrap"]
+    path = tmp_path / "state.json"
+    path.write_text(json.dumps(state), encoding="utf-8")
+    assert Calculator.load(str(path)).utt_errors == recorded.utt_errors
@@ -0,0 +1,56 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import subprocess
+import sys
+
+import pytest
+from click.testing import CliRunner
+
+from compute_wer.cli import cli
+
+
+@pytest.fixture
+def scp(tmp_path):
+    ref, hyp = tmp_path / "ref.txt", tmp_path / "hyp.txt"
+    ref.write_text("u1 hello world 你好\nu2 the 3 cats\n", encoding="utf-8")
+    hyp.write_text("u1 hello word 你\nu2 a 3 cats\n", encoding="utf-8")
+    return str(ref), str(hyp)
+
+
+@pytest.mark.parametrize("mode", ["--streaming", "--stdin"])
+def test_jobs_not_combined(scp, mode):
+    args = ["-j", "2", mode] + (list(scp) if mode == "--streaming" else [])
+    result = CliRunner().invoke(cli, args, input="a b\ta c\n")
+    assert result.exit_code == 2
+    assert "--jobs cannot be combined" in result.output
+
+
+def test_modes_same_summary(scp):
+    outputs = []
+    for mode in ([], ["--index"], ["--streaming"], ["-j", "2"]):
+        result = CliRunner().invoke(cli, ["--no-verbose", *mode, *scp])
+        assert result.exit_code == 0, result.output
+        outputs.append(result.output)
+    # The clusters are sorted by name, whatever the scoring order of the utterances.
+    assert "Chinese ->" in outputs[0] and outputs[0].index("Chinese ->") < outputs[0].index("English ->")
+    assert outputs[1:] == outputs[:1] * 3
+
+
+def test_startup_imports():
+    # The calculator and the modules only needed by some options are imported by the commands using them.
+    code = "import sys, compute_wer.cli; print(' '.join(sorted(sys.modules)))"
+    modules = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+    for module in ("compute_wer.calculator", "gzip", "json", "csv", "numpy"):
+        assert module not in modules
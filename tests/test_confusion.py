@@ -0,0 +1,29 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+
+from compute_wer.confusion import ConfusionIndex
+from compute_wer.wer import Alignment
+
+
+def test_query():
+    index = ConfusionIndex()
+    index.add(Alignment(["A", "B", "C", "D"], ["X", "B", "Y"], "SCSD"))
+    index.add(Alignment(["A", "C"], ["X", "Y", "Z"], "SSI"))
+    assert index.query(2) == [("A", "X", 2), ("C", "Y", 2)]
+    assert index.query(None, "del") == [("D", "", 1)]
+    assert index.query(0) == []
+    with pytest.raises(ValueError):
+        index.query(-1)
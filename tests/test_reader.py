@@ -0,0 +1,65 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+
+import numpy as np
+
+from compute_wer.reader import ScpReader
+
+
+def read(path, **kwargs):
+    with ScpReader(path, **kwargs) as reader:
+        return dict(reader)
+
+
+def test_scp_and_jsonl(tmp_path):
+    scp = tmp_path / "text"
+    scp.write_text("u2 world\nu1 hello there\n\n  u3 indented\n", encoding="utf-8")
+    assert read(str(scp)) == {"u1": "hello there", "u2": "world", "u3": "indented"}
+    jsonl = tmp_path / "manifest.jsonl"
+    jsonl.write_text('{"key": "u1", "text": "你好"}\n{"key": "u2", "text": "世界"}\n', encoding="utf-8")
+    with ScpReader(str(jsonl)) as reader:
+        assert reader.texts(["u2", "missing"], default="") == ["世界", ""]
+
+
+def test_index_rewritten_with_same_mtime(tmp_path):
+    path = tmp_path / "text"
+    path.write_text("u1 hello\nu2 world\n", encoding="utf-8")
+    assert read(str(path)) == {"u1": "hello", "u2": "world"}
+    assert os.path.exists(f"{path}.idx")
+
+    # Rewritten within the same modification time tick, the saved byte spans are stale.
+    mtime = path.stat().st_mtime_ns
+    path.write_text("u1 hello there\nu2 w\n", encoding="utf-8")
+    os.utime(path, ns=(mtime, mtime))
+    assert read(str(path)) == {"u1": "hello there", "u2": "w"}
+
+
+def test_index_without_signature(tmp_path):
+    path = tmp_path / "text"
+    path.write_text("u1 hello\n", encoding="utf-8")
+    with ScpReader(str(path), save_index=False) as reader:
+        index = reader.index
+    with open(f"{path}.idx", "wb") as fout:
+        np.save(fout, index[:0])
+    assert read(str(path)) == {"u1": "hello"}
+
+
+def test_index_not_writable(tmp_path):
+    path = tmp_path / "text"
+    path.write_text("u1 hello\n", encoding="utf-8")
+    index_path = tmp_path / "missing" / "text.idx"
+    assert read(str(path), index_path=str(index_path)) == {"u1": "hello"}
+    assert not index_path.exists()
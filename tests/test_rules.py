@@ -0,0 +1,57 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+
+import pytest
+
+from compute_wer.rules import RewriteRules
+
+
+def test_single_pass():
+    rules = RewriteRules([("colour", "color", False), ("um", "", False), (r"(\d+)%", r"\1 percent", True)])
+    assert rules.apply("Um the colour of 5% umbrella") == " the color of 5 percent umbrella"
+    assert rules.report() == [("um -> ", 1), ("colour -> color", 1), ("re:(\\d+)% -> \\1 percent", 1)]
+
+
+def test_backreferences_in_own_pass():
+    rules = RewriteRules([("colour", "color", False), (r"(\w)\1", r"\1", True)])
+    assert rules.apply("colour aa bb") == "color a b"
+    assert rules.report() == [("re:(\\w)\\1 -> \\1", 2), ("colour -> color", 1)]
+
+
+def test_named_groups_and_global_flags():
+    rules = RewriteRules(
+        [(r"(?P<n>\d+)%", r"\g<n> percent", True), (r"(?P<n>\d+)\$", r"\g<n> dollars", True), ("(?i)abc", "x", True)],
+        case_sensitive=True,
+    )
+    assert rules.apply("5% 6$ ABC") == "5 percent 6 dollars x"
+    # Scoped to its rule, the flag does not make the other rules case insensitive.
+    rules.add("q", "w")
+    assert rules.apply("q Q") == "w Q"
+
+
+@pytest.mark.parametrize("pattern, replacement", [("(a", ""), ("(a)", r"\2"), ("(?L)a", ""), ("(?P<n>a)", r"\g<m>")])
+def test_invalid_rules(tmp_path, pattern, replacement):
+    with pytest.raises(ValueError, match="Invalid regex rule"):
+        RewriteRules([(pattern, replacement, True)])
+    path = tmp_path / "rules.tsv"
+    path.write_text(f"# comment\nuh\t\nre:{pattern}\t{replacement}\n", encoding="utf-8")
+    with pytest.raises(ValueError, match="line 3"):
+        RewriteRules.load(str(path))
+
+
+def test_pickle():
+    rules = RewriteRules([("colour", "color", False), (r"(\w)\1", r"\1", True)])
+    assert pickle.loads(pickle.dumps(rules)).apply("colour aa") == "color a"
@@ -0,0 +1,52 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import os
+
+import pytest
+
+from compute_wer.utils import Normalizer, normalize, tokenize
+
+# The texts of the differential corpus, with the tokens of the per-character tokenizer for each combination of
+# `to_char` and `ignore_punctuation`.
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "tokenize.jsonl")
+COMBINATIONS = {
+    "word": (False, False),
+    "word-ignore-punctuation": (False, True),
+    "char": (True, False),
+    "char-ignore-punctuation": (True, True),
+}
+
+
+def load_corpus():
+    with open(CORPUS, encoding="utf-8") as fin:
+        return [json.loads(line) for line in fin if line.strip()]
+
+
+@pytest.mark.parametrize("record", load_corpus(), ids=lambda record: record["text"][:20] or "empty")
+@pytest.mark.parametrize("combination", COMBINATIONS)
+def test_tokenize(record, combination):
+    to_char, ignore_punctuation = COMBINATIONS[combination]
+    assert tokenize(record["text"], to_char, ignore_punctuation) == record["tokens"][combination]
+
+
+@pytest.mark.parametrize("combination", COMBINATIONS)
+def test_normalizer(combination):
+    to_char, ignore_punctuation = COMBINATIONS[combination]
+    normalizer = Normalizer(to_char, ignore_punctuation=ignore_punctuation)
+    for record in load_corpus():
+        expected = [token.upper() for token in record["tokens"][combination]]
+        assert normalize(record["text"], to_char, ignore_punctuation=ignore_punctuation) == expected
+        assert normalizer(record["text"]) == expected
@@ -0,0 +1,38 @@
+# Copyright (c) 2025, Zhendong Peng (pzd17@tsinghua.org.cn)
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+
+from compute_wer import utils
+from compute_wer.utils import Normalizer
+
+
+def unpickle(payloads):
+    normalizers = [pickle.loads(payload) for payload in payloads]
+    return len(utils._shared_instances), normalizers[0] is normalizers[1], normalizers[-1] is normalizers[-2]
+
+
+def test_shared_instances_bounded():
+    normalizer = Normalizer()
+    # The copies of a key are the same object in a worker, and the old keys are evicted.
+    payloads = [pickle.dumps(normalizer)] * 2 + [
+        pickle.dumps(Normalizer()) for _ in range(utils.MAX_SHARED_INSTANCES * 2)
+    ]
+    with ProcessPoolExecutor(1) as executor:
+        size, aliased, distinct = executor.submit(unpickle, payloads).result()
+    assert size == utils.MAX_SHARED_INSTANCES
+    assert aliased and not distinct
+    # The main process builds a new instance, like a normal unpickling.
+    assert pickle.loads(pickle.dumps(normalizer)) is not normalizer